@@ -0,0 +1,480 @@
+"""Process-local stand-in for the subset of Motor that server.py uses.
+
+Selected with STORAGE_BACKEND=memory for tests, benchmarks and local runs.
+Queries, updates and aggregation pipelines follow MongoDB's semantics for
+the operators the app issues; anything else raises ValueError.
+"""
+import bisect
+import copy
+import re
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+from pymongo.errors import CollectionInvalid, DuplicateKeyError
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+MISSING = object()
+
+def get_path(doc, path: str):
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, list):
+            value = [item.get(part, MISSING) for item in value if isinstance(item, dict)]
+            value = [item for item in value if item is not MISSING] or MISSING
+        elif isinstance(value, dict):
+            value = value.get(part, MISSING)
+        else:
+            return MISSING
+        if value is MISSING:
+            return MISSING
+    return value
+
+def compare_values(value, operator: str, operand) -> bool:
+    try:
+        if operator == "$gt":
+            return value > operand
+        if operator == "$gte":
+            return value >= operand
+        if operator == "$lt":
+            return value < operand
+        if operator == "$lte":
+            return value <= operand
+    except TypeError:
+        return False  # Mongo only compares values of the same type
+    raise ValueError(f"Unsupported operator {operator}")
+
+def match_condition(value, condition) -> bool:
+    if not (isinstance(condition, dict) and condition and next(iter(condition)).startswith("$")):
+        if isinstance(value, list) and not isinstance(condition, list):
+            return condition in value
+        return (None if value is MISSING else value) == condition
+    
+    for operator, operand in condition.items():
+        candidates = value if isinstance(value, list) else [value]
+        present = [item for item in candidates if item is not MISSING]
+        if operator == "$eq":
+            matched = match_condition(value, operand)
+        elif operator == "$ne":
+            matched = not match_condition(value, operand)
+        elif operator == "$in":
+            matched = any(match_condition(value, option) for option in operand)
+        elif operator == "$nin":
+            matched = not any(match_condition(value, option) for option in operand)
+        elif operator == "$exists":
+            matched = (value is not MISSING) == bool(operand)
+        elif operator == "$regex":
+            pattern = re.compile(operand, re.IGNORECASE if "i" in condition.get("$options", "") else 0)
+            matched = any(isinstance(item, str) and pattern.search(item) for item in present)
+        elif operator == "$options":
+            continue
+        elif operator == "$type":
+            types = {"string": str, "binData": uuid.UUID, "date": datetime, "bool": bool}
+            matched = any(isinstance(item, types[operand]) for item in present)
+        else:
+            matched = any(item is not None and compare_values(item, operator, operand) for item in present)
+        if not matched:
+            return False
+    return True
+
+def match_filter(doc: dict, filter_dict: dict) -> bool:
+    for key, condition in filter_dict.items():
+        if key == "$or":
+            if not any(match_filter(doc, clause) for clause in condition):
+                return False
+        elif key == "$and":
+            if not all(match_filter(doc, clause) for clause in condition):
+                return False
+        elif not match_condition(get_path(doc, key), condition):
+            return False
+    return True
+
+def apply_update(doc: dict, update: dict, inserting: bool = False):
+    for operator, fields in update.items():
+        if operator == "$setOnInsert" and not inserting:
+            continue
+        for field, operand in fields.items():
+            current = doc.get(field)
+            if operator in ("$set", "$setOnInsert"):
+                doc[field] = copy.deepcopy(operand)
+            elif operator == "$currentDate":
+                # BSON dates have millisecond precision
+                now = datetime.utcnow()
+                doc[field] = now.replace(microsecond=now.microsecond // 1000 * 1000)
+            elif operator == "$unset":
+                doc.pop(field, None)
+            elif operator == "$inc":
+                doc[field] = (current or 0) + operand
+            elif operator == "$min":
+                doc[field] = operand if current is None or operand < current else current
+            elif operator == "$max":
+                doc[field] = operand if current is None or operand > current else current
+            elif operator == "$push":
+                items = doc.setdefault(field, [])
+                if isinstance(operand, dict) and "$each" in operand:
+                    items.extend(copy.deepcopy(operand["$each"]))
+                    if "$slice" in operand:
+                        limit = operand["$slice"]
+                        doc[field] = items[limit:] if limit < 0 else items[:limit]
+                else:
+                    items.append(copy.deepcopy(operand))
+            else:
+                raise ValueError(f"Unsupported update operator {operator}")
+
+def project(doc: dict, projection: Optional[dict]) -> dict:
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    include_id = projection.get("_id", 1)
+    included = [field for field, flag in projection.items() if flag and field != "_id"]
+    if included:
+        doc = {field: doc[field] for field in included if field in doc} | ({"_id": doc["_id"]} if include_id and "_id" in doc else {})
+    else:
+        for field, flag in projection.items():
+            if not flag:
+                doc.pop(field, None)
+    return doc
+
+def sort_key(value):
+    # Mongo orders missing/null before numbers, strings and dates
+    if value is MISSING or value is None:
+        return (0, 0)
+    return (1, value)
+
+def evaluate_expression(doc: dict, expression):
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = get_path(doc, expression[1:])
+        return None if value is MISSING else value
+    return expression
+
+def accumulate(docs: List[dict], accumulator: dict):
+    operator, expression = next(iter(accumulator.items()))
+    values = [evaluate_expression(doc, expression) for doc in docs]
+    numbers = [value for value in values if isinstance(value, (int, float))]
+    if operator == "$sum":
+        return sum(numbers)
+    if operator == "$avg":
+        return sum(numbers) / len(numbers) if numbers else None
+    if operator == "$min":
+        return min(numbers, default=None)
+    if operator == "$max":
+        return max(numbers, default=None)
+    raise ValueError(f"Unsupported accumulator {operator}")
+
+def group_documents(docs: List[dict], key_expression, accumulators: dict) -> List[dict]:
+    groups: Dict[str, tuple] = {}
+    for doc in docs:
+        key = evaluate_expression(doc, key_expression)
+        groups.setdefault(repr(key), (key, []))[1].append(doc)
+    return [
+        {"_id": key, **{name: accumulate(members, accumulator) for name, accumulator in accumulators.items()}}
+        for key, members in groups.values()
+    ]
+
+def sort_documents(docs: List[dict], sort_spec) -> List[dict]:
+    docs = list(docs)
+    for field, direction in reversed(list(sort_spec.items() if isinstance(sort_spec, dict) else sort_spec)):
+        docs.sort(key=lambda doc: sort_key(get_path(doc, field)), reverse=direction < 0)
+    return docs
+
+def run_pipeline(docs: List[dict], pipeline: List[dict]) -> List[dict]:
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$match":
+            docs = [doc for doc in docs if match_filter(doc, spec)]
+        elif name == "$project":
+            docs = [project(doc, spec) for doc in docs]
+        elif name == "$unwind":
+            field = (spec if isinstance(spec, str) else spec["path"])[1:]
+            unwound = []
+            for doc in docs:
+                value = doc.get(field)
+                for item in value if isinstance(value, list) else ([] if value is None else [value]):
+                    unwound.append({**doc, field: item})
+            docs = unwound
+        elif name == "$group":
+            docs = group_documents(docs, spec["_id"], {k: v for k, v in spec.items() if k != "_id"})
+        elif name == "$sortByCount":
+            docs = sort_documents(group_documents(docs, spec, {"count": {"$sum": 1}}), {"count": -1})
+        elif name == "$sort":
+            docs = sort_documents(docs, spec)
+        elif name == "$skip":
+            docs = docs[spec:]
+        elif name == "$limit":
+            docs = docs[:spec]
+        elif name == "$count":
+            docs = [{spec: len(docs)}] if docs else []
+        elif name == "$bucket":
+            boundaries = spec["boundaries"]
+            buckets: Dict[object, List[dict]] = {}
+            for doc in docs:
+                value = evaluate_expression(doc, spec["groupBy"])
+                index = bisect.bisect_right(boundaries, value) - 1 if isinstance(value, (int, float)) else -1
+                if 0 <= index < len(boundaries) - 1:
+                    buckets.setdefault(boundaries[index], []).append(doc)
+                elif "default" in spec:
+                    buckets.setdefault(spec["default"], []).append(doc)
+                else:
+                    raise ValueError("$bucket value outside boundaries and no default")
+            output = spec.get("output", {"count": {"$sum": 1}})
+            order = [bound for bound in boundaries if bound in buckets] + ([spec["default"]] if spec.get("default") in buckets else [])
+            docs = [{"_id": key, **{field: accumulate(buckets[key], acc) for field, acc in output.items()}} for key in order]
+        elif name == "$facet":
+            docs = [{field: run_pipeline(docs, sub_pipeline) for field, sub_pipeline in spec.items()}]
+        else:
+            raise ValueError(f"Unsupported aggregation stage {name}")
+    return docs
+
+class InMemoryResults:
+    def __init__(self, results: List[dict]):
+        self._results = results
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        return self._results if length is None else self._results[:length]
+
+    def __aiter__(self):
+        self._iterator = iter(self._results)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+class InMemoryCursor:
+    def __init__(self, collection: "InMemoryCollection", filter_dict: dict, projection: Optional[dict]):
+        self._collection = collection
+        self._filter = filter_dict
+        self._projection = projection
+        self._sort = []
+        self._limit = 0
+        self._results = None
+
+    def sort(self, key, direction: int = 1):
+        self._sort = list(key) if isinstance(key, list) else [(key, direction)]
+        return self
+
+    def limit(self, limit: int):
+        self._limit = limit
+        return self
+
+    def batch_size(self, size: int):
+        return self
+
+    def _evaluate(self) -> List[dict]:
+        docs = [doc for doc in self._collection._docs.values() if match_filter(doc, self._filter)]
+        for field, direction in reversed(self._sort):
+            if field == "$natural":
+                docs = docs[::-1] if direction < 0 else docs
+            else:
+                docs.sort(key=lambda doc: sort_key(get_path(doc, field)), reverse=direction < 0)
+        if self._limit:
+            docs = docs[:self._limit]
+        return [project(doc, self._projection) for doc in docs]
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        results = self._evaluate()
+        return results if length is None else results[:length]
+
+    def __aiter__(self):
+        self._results = iter(self._evaluate())
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._results)
+        except StopIteration:
+            raise StopAsyncIteration
+
+class InMemoryCollection:
+    """The subset of Motor's collection API used by this app, over plain dicts.
+
+    Every operation completes without awaiting, so single-document updates
+    are atomic with respect to other coroutines, as they are in MongoDB.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._docs: Dict[object, dict] = {}
+        self._options: dict = {}
+        self.indexes: List[tuple] = []
+
+    def _insert(self, doc: dict):
+        doc.setdefault("_id", ObjectId())
+        if doc["_id"] in self._docs:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} dup key: {{ _id: {doc['_id']!r} }}")
+        self._docs[doc["_id"]] = copy.deepcopy(doc)
+        return doc["_id"]
+
+    def _update(self, filter_dict: dict, update: dict, upsert: bool, many: bool) -> tuple:
+        matched = [doc for doc in self._docs.values() if match_filter(doc, filter_dict)]
+        if not many:
+            matched = matched[:1]
+        for doc in matched:
+            apply_update(doc, update)
+        upserted_id = None
+        if not matched and upsert:
+            doc = {key: copy.deepcopy(value) for key, value in filter_dict.items()
+                   if not key.startswith("$") and not (isinstance(value, dict) and any(k.startswith("$") for k in value))}
+            apply_update(doc, update, inserting=True)
+            upserted_id = self._insert(doc)
+        return len(matched), upserted_id
+
+    async def insert_one(self, doc: dict, session=None):
+        return InsertOneResult(self._insert(doc), True)
+
+    async def insert_many(self, docs: List[dict], ordered: bool = True):
+        return InsertManyResult([self._insert(doc) for doc in docs], True)
+
+    def find(self, filter_dict: Optional[dict] = None, projection: Optional[dict] = None, session=None) -> InMemoryCursor:
+        return InMemoryCursor(self, filter_dict or {}, projection)
+
+    async def find_one(self, filter_dict: Optional[dict] = None, projection: Optional[dict] = None, session=None):
+        results = await self.find(filter_dict, projection).limit(1).to_list(1)
+        return results[0] if results else None
+
+    async def count_documents(self, filter_dict: dict, session=None) -> int:
+        return sum(1 for doc in self._docs.values() if match_filter(doc, filter_dict))
+
+    def aggregate(self, pipeline: List[dict], session=None) -> InMemoryResults:
+        return InMemoryResults(run_pipeline([copy.deepcopy(doc) for doc in self._docs.values()], pipeline))
+
+    async def distinct(self, field: str, filter_dict: Optional[dict] = None) -> list:
+        values = []
+        for doc in self._docs.values():
+            value = get_path(doc, field)
+            if value is MISSING or not match_filter(doc, filter_dict or {}):
+                continue
+            for item in value if isinstance(value, list) else [value]:
+                if item not in values:
+                    values.append(item)
+        return values
+
+    async def update_one(self, filter_dict: dict, update: dict, upsert: bool = False, session=None):
+        matched, upserted_id = self._update(filter_dict, update, upsert, many=False)
+        raw = {"n": matched or int(upserted_id is not None), "nModified": matched}
+        if upserted_id is not None:
+            raw["upserted"] = upserted_id
+        return UpdateResult(raw, True)
+
+    async def update_many(self, filter_dict: dict, update: dict, upsert: bool = False, session=None):
+        matched, upserted_id = self._update(filter_dict, update, upsert, many=True)
+        raw = {"n": matched or int(upserted_id is not None), "nModified": matched}
+        if upserted_id is not None:
+            raw["upserted"] = upserted_id
+        return UpdateResult(raw, True)
+
+    async def find_one_and_update(self, filter_dict: dict, update: dict, projection: Optional[dict] = None,
+                                  upsert: bool = False, return_document: bool = False):
+        before = next((doc for doc in self._docs.values() if match_filter(doc, filter_dict)), None)
+        snapshot = project(before, projection) if before is not None else None
+        _, upserted_id = self._update(filter_dict, update, upsert, many=False)
+        if not return_document:
+            return snapshot
+        after = before if before is not None else self._docs.get(upserted_id)
+        return project(after, projection) if after is not None else None
+
+    async def delete_one(self, filter_dict: dict):
+        doc = next((doc for doc in self._docs.values() if match_filter(doc, filter_dict)), None)
+        if doc is not None:
+            del self._docs[doc["_id"]]
+        return DeleteResult({"n": int(doc is not None)}, True)
+
+    async def delete_many(self, filter_dict: dict):
+        doomed = [key for key, doc in self._docs.items() if match_filter(doc, filter_dict)]
+        for key in doomed:
+            del self._docs[key]
+        return DeleteResult({"n": len(doomed)}, True)
+
+    async def bulk_write(self, operations: list, ordered: bool = True):
+        modified = matched = inserted = 0
+        for operation in operations:
+            kind = type(operation).__name__
+            if kind == "InsertOne":
+                self._insert(operation._doc)
+                inserted += 1
+            elif kind in ("UpdateOne", "UpdateMany"):
+                count, _ = self._update(operation._filter, operation._doc, bool(operation._upsert), kind == "UpdateMany")
+                matched += count
+                modified += count
+            else:
+                raise ValueError(f"Unsupported bulk operation {kind}")
+        return BulkWriteResult({"nInserted": inserted, "nMatched": matched, "nModified": modified,
+                                "nUpserted": 0, "nRemoved": 0, "upserted": []}, True)
+
+    async def create_index(self, keys, **options):
+        self.indexes.append((keys, options))
+        return keys if isinstance(keys, str) else "_".join(f"{field}_{direction}" for field, direction in keys)
+
+    async def options(self) -> dict:
+        return dict(self._options)
+
+class InMemoryDatabase:
+    def __init__(self, name: str):
+        self.name = name
+        self._collections: Dict[str, InMemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> InMemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = InMemoryCollection(name)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> InMemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def create_collection(self, name: str, **options):
+        if name in self._collections:
+            raise CollectionInvalid(f"collection {name} already exists")
+        collection = self[name]
+        collection._options = dict(options)
+        return collection
+
+    async def list_collection_names(self) -> List[str]:
+        return list(self._collections)
+
+    async def command(self, name: str, *args, **kwargs) -> dict:
+        if name in ("hello", "ping"):
+            return {"ok": 1.0, "localTime": datetime.utcnow()}
+        raise ValueError(f"Unsupported command {name}")
+
+class InMemorySession:
+    # A single store is always causally consistent with itself
+    cluster_time = None
+    operation_time = None
+
+    def advance_cluster_time(self, cluster_time):
+        pass
+
+    def advance_operation_time(self, operation_time):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+class InMemoryClient:
+    def __init__(self):
+        self._databases: Dict[str, InMemoryDatabase] = {}
+
+    def __getitem__(self, name: str) -> InMemoryDatabase:
+        if name not in self._databases:
+            self._databases[name] = InMemoryDatabase(name)
+        return self._databases[name]
+
+    def get_database(self, name: str, **options) -> InMemoryDatabase:
+        return self[name]
+
+    async def start_session(self, **options) -> InMemorySession:
+        return InMemorySession()
+
+    async def drop_database(self, name: str):
+        self._databases.pop(name, None)
+
+    def close(self):
+        pass
@@ -1,25 +1,137 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header
+from fastapi.encoders import jsonable_encoder
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
+from starlette.datastructures import MutableHeaders
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
+import atexit
+import base64
+import bisect
+import copy
+import hashlib
+import hmac
+import json
 import logging
+import logging.handlers
+import queue
+import random
+import re
+import socket
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, field_validator
+import bson
+from bson import ObjectId
+from pymongo import CursorType, UpdateOne, monitoring
+from pymongo.errors import CollectionInvalid, DuplicateKeyError
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+from typing import Callable, Dict, List, Optional
 import uuid
+import zlib
 from datetime import datetime, timedelta
 import bcrypt
 import jwt
+import numpy as np
+
+try:
+    import brotli
+except ImportError:  # optional: responses are gzip-only without it
+    brotli = None
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# MongoDB command monitoring. Motor runs commands in executor threads with a
+# copy of the caller's context, so listeners can see per-request context vars.
+request_scope: ContextVar[Optional[dict]] = ContextVar("request_scope", default=None)
+# request_id, user_id and start time of the current request, for log records,
+# plus the causal tokens it received and is sending back
+log_context: ContextVar[Optional[dict]] = ContextVar("log_context", default=None)
+active_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("active_profile", default=None)
+
+# Reads counted per replica set member. getMore is left out: it continues a
+# read already counted, and the invalidation bus's tailable cursor sends a
+# couple per second to the primary.
+READ_COMMANDS = {"find", "aggregate", "count", "distinct"}
+
+class MongoCommandListener(monitoring.CommandListener):
+    def started(self, event):
+        slow_query_monitor.command_started(event)
+        profile = active_profile.get()
+        if profile is not None:
+            profile.command_started(event)
+
+    def succeeded(self, event):
+        slow_query_monitor.command_succeeded(event)
+        if event.command_name in READ_COMMANDS:
+            host, port = event.connection_id
+            metrics[f"reads.{host}:{port}"] += 1
+        profile = active_profile.get()
+        if profile is not None:
+            profile.command_finished(event, ok=True)
+
+    def failed(self, event):
+        slow_query_monitor.command_failed(event)
+        profile = active_profile.get()
+        if profile is not None:
+            profile.command_finished(event, ok=False)
+
+# Storage backend: "mongo" (default) or "memory", a process-local store with
+# the same query and update semantics for tests, benchmarks and local runs
+# (backend/memory_store.py)
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'mongo')
+
+# Read routing: listing, analytics and per-user history reads go through
+# `replica_db` with STALE_READ_PREFERENCE (secondaryPreferred falls back to the
+# primary on a standalone server). STALE_READ_MAX_STALENESS_SECONDS bounds
+# secondary lag (0 = unbounded, otherwise at least 90). Reads that follow the
+# same user's writes run in causally consistent sessions; the last write time
+# of up to CAUSAL_SESSION_CACHE_SIZE users is kept per worker. Writes also
+# return it, signed, in the X-Causal-Token response header; clients send the
+# latest one back, so reads served by another worker wait for it too. The token
+# is not a credential and expires after CAUSAL_TOKEN_SECONDS, well past any
+# replication lag.
+STALE_READ_PREFERENCE = os.environ.get('STALE_READ_PREFERENCE', 'secondaryPreferred')
+STALE_READ_MAX_STALENESS_SECONDS = int(os.environ.get('STALE_READ_MAX_STALENESS_SECONDS', '0'))
+CAUSAL_SESSION_CACHE_SIZE = int(os.environ.get('CAUSAL_SESSION_CACHE_SIZE', '10000'))
+CAUSAL_TOKEN_SECONDS = int(os.environ.get('CAUSAL_TOKEN_SECONDS', '3600'))
+READ_PREFERENCE_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+def read_preference(mode: str, max_staleness: int = 0):
+    if mode == "primary":
+        return Primary()
+    return READ_PREFERENCE_MODES[mode](max_staleness=max_staleness or -1)
+
 # MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+if STORAGE_BACKEND == "memory":
+    try:
+        from .memory_store import InMemoryClient
+    except ImportError:  # run as a top-level module: `uvicorn server:app` from backend/
+        from memory_store import InMemoryClient
+
+    client = InMemoryClient()
+else:
+    mongo_url = os.environ['MONGO_URL']
+    client = AsyncIOMotorClient(mongo_url, uuidRepresentation="standard", event_listeners=[MongoCommandListener()])
 db = client[os.environ['DB_NAME']]
+replica_db = client.get_database(
+    os.environ['DB_NAME'],
+    read_preference=read_preference(STALE_READ_PREFERENCE, STALE_READ_MAX_STALENESS_SECONDS)
+)
 
 # Create the main app without a prefix
 app = FastAPI()
@@ -32,9 +144,198 @@ security = HTTPBearer()
 JWT_SECRET = "your-secret-key-change-in-production"
 JWT_ALGORITHM = "HS256"
 
+# Id storage: "string" stores ids as 36-character strings, "binary" as 16-byte
+# BSON UUIDs. "dual" writes binary and matches both forms while
+# scripts/migrate_binary_ids.py converts existing documents.
+ID_STORAGE_FORMAT = os.environ.get('ID_STORAGE_FORMAT', 'string')
+ID_FIELDS = ("id", "customer_id", "seller_id", "request_id", "offer_id", "sender_id", "receiver_id", "duplicate_of")
+
+# Operational endpoints (metrics, profiling) require this token in X-Admin-Token
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# On-demand profiling: requests sent with X-Profile: <ADMIN_TOKEN>, plus one in
+# every PROFILE_SAMPLE_EVERY requests (0 disables sampling), are profiled and
+# written to the newest PROFILE_RING_SIZE entries of PROFILE_DIR
+PROFILE_SAMPLE_EVERY = int(os.environ.get('PROFILE_SAMPLE_EVERY', '0'))
+PROFILE_INTERVAL_SECONDS = float(os.environ.get('PROFILE_INTERVAL_SECONDS', '0.001'))
+PROFILE_DIR = Path(os.environ.get('PROFILE_DIR', '/tmp/profiles'))
+PROFILE_RING_SIZE = int(os.environ.get('PROFILE_RING_SIZE', '50'))
+
+# Slow-query log: reads slower than SLOW_QUERY_MS, or whose explain shows more
+# than SLOW_QUERY_EXAMINED_RATIO documents examined per document returned, are
+# recorded with their plan in the capped slow_queries collection, at most once
+# per query shape every SLOW_QUERY_DEDUP_SECONDS
+SLOW_QUERY_LOG_ENABLED = os.environ.get('SLOW_QUERY_LOG_ENABLED', 'true').lower() == 'true'
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '100'))
+SLOW_QUERY_EXAMINED_RATIO = float(os.environ.get('SLOW_QUERY_EXAMINED_RATIO', '10'))
+SLOW_QUERY_DEDUP_SECONDS = float(os.environ.get('SLOW_QUERY_DEDUP_SECONDS', '3600'))
+SLOW_QUERY_LOG_BYTES = int(os.environ.get('SLOW_QUERY_LOG_BYTES', str(16 * 1024 * 1024)))
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Lifecycle sweeper: expires trials, open requests and pending offers.
+# A retention of 0 days disables that policy.
+LIFECYCLE_SWEEP_ENABLED = os.environ.get('LIFECYCLE_SWEEP_ENABLED', 'true').lower() == 'true'
+LIFECYCLE_SWEEP_INTERVAL_SECONDS = float(os.environ.get('LIFECYCLE_SWEEP_INTERVAL_SECONDS', '300'))
+LIFECYCLE_SWEEP_JITTER = float(os.environ.get('LIFECYCLE_SWEEP_JITTER', '0.2'))
+LIFECYCLE_SWEEP_BATCH_SIZE = int(os.environ.get('LIFECYCLE_SWEEP_BATCH_SIZE', '500'))
+REQUEST_RETENTION_DAYS = int(os.environ.get('REQUEST_RETENTION_DAYS', '60'))
+OFFER_RETENTION_DAYS = int(os.environ.get('OFFER_RETENTION_DAYS', '30'))
+
+# Idempotency-Key replay window and size of the per-worker front cache. A key
+# whose first attempt has not finished within IDEMPOTENCY_LEASE_SECONDS (its
+# worker died, or storing the response failed) can be taken over by a retry.
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', '86400'))
+IDEMPOTENCY_LEASE_SECONDS = int(os.environ.get('IDEMPOTENCY_LEASE_SECONDS', '60'))
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', '10000'))
+
+# Category analytics snapshot
+ANALYTICS_REFRESH_SECONDS = float(os.environ.get('ANALYTICS_REFRESH_SECONDS', '600'))
+ANALYTICS_BATCH_SIZE = int(os.environ.get('ANALYTICS_BATCH_SIZE', '5000'))
+ANALYTICS_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+# Near-duplicate request detection (MinHash signatures, LSH banding)
+DUPLICATE_DETECTION_ENABLED = os.environ.get('DUPLICATE_DETECTION_ENABLED', 'true').lower() == 'true'
+DUPLICATE_SIMILARITY_THRESHOLD = float(os.environ.get('DUPLICATE_SIMILARITY_THRESHOLD', '0.7'))
+DUPLICATE_NUM_PERM = 64
+DUPLICATE_BANDS = 16
+DUPLICATE_SHINGLE_SIZE = 5
+
+# In-memory snapshot of open requests serving GET /requests, kept current by
+# this worker's writes and fully reloaded every OPEN_REQUESTS_RESYNC_SECONDS
+OPEN_REQUESTS_SNAPSHOT_ENABLED = os.environ.get('OPEN_REQUESTS_SNAPSHOT_ENABLED', 'true').lower() == 'true'
+OPEN_REQUESTS_RESYNC_SECONDS = float(os.environ.get('OPEN_REQUESTS_RESYNC_SECONDS', '60'))
+
+# Single-flight reads: concurrent identical listing and request lookups share
+# one database call, and with SINGLE_FLIGHT_TTL_SECONDS > 0 its result is
+# reused for that long (up to SINGLE_FLIGHT_CACHE_SIZE keys). For
+# SINGLE_FLIGHT_WRITE_GRACE_SECONDS after a user's own write their reads run
+# alone, so they are never answered by a query that started before the write.
+SINGLE_FLIGHT_ENABLED = os.environ.get('SINGLE_FLIGHT_ENABLED', 'true').lower() == 'true'
+SINGLE_FLIGHT_TTL_SECONDS = float(os.environ.get('SINGLE_FLIGHT_TTL_SECONDS', '0'))
+SINGLE_FLIGHT_CACHE_SIZE = int(os.environ.get('SINGLE_FLIGHT_CACHE_SIZE', '1000'))
+SINGLE_FLIGHT_WRITE_GRACE_SECONDS = float(os.environ.get('SINGLE_FLIGHT_WRITE_GRACE_SECONDS', '5'))
+
+# Cache invalidation bus: workers publish invalidated keys to the capped
+# `cache_invalidations` collection and tail it, so a write on one worker
+# evicts the matching cache entries on every worker within about
+# CACHE_BUS_AWAIT_MS. Users are cached for USER_CACHE_SECONDS only while the
+# tail is up; when it drops, bus-managed caches are cleared and bypassed, and
+# the tail is retried after 1 second, doubling up to CACHE_BUS_RETRY_MAX_SECONDS
+# while it keeps failing.
+CACHE_BUS_ENABLED = os.environ.get('CACHE_BUS_ENABLED', 'true').lower() == 'true'
+CACHE_BUS_AWAIT_MS = int(os.environ.get('CACHE_BUS_AWAIT_MS', '500'))
+CACHE_BUS_BYTES = int(os.environ.get('CACHE_BUS_BYTES', str(8 * 1024 * 1024)))
+CACHE_BUS_RETRY_MAX_SECONDS = float(os.environ.get('CACHE_BUS_RETRY_MAX_SECONDS', '60'))
+USER_CACHE_SECONDS = float(os.environ.get('USER_CACHE_SECONDS', '60'))
+USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE', '10000'))
+
+# Facet counts for GET /requests/facets: budget_max histogram boundaries (the
+# last bucket is open-ended, values below the first get their own bucket), how
+# many locations to list, and how long counts for one filter combination are
+# reused. Boundaries must be strictly increasing; anything else fails startup.
+FACET_BUDGET_BOUNDARIES = [float(b) for b in os.environ.get('FACET_BUDGET_BOUNDARIES', '0,1000,5000,10000,50000,100000').split(',')]
+if any(low >= high for low, high in zip(FACET_BUDGET_BOUNDARIES, FACET_BUDGET_BOUNDARIES[1:])):
+    raise ValueError(f"FACET_BUDGET_BOUNDARIES must be sorted and unique, got {FACET_BUDGET_BOUNDARIES}")
+FACET_LOCATION_LIMIT = int(os.environ.get('FACET_LOCATION_LIMIT', '20'))
+FACET_CACHE_SECONDS = float(os.environ.get('FACET_CACHE_SECONDS', '30'))
+
+# Delta sync: changes to requests and offers are logged in `change_log` for
+# SYNC_LOG_RETENTION_DAYS. GET /sync returns up to SYNC_PAGE_SIZE of them per
+# call and holds back the newest SYNC_SETTLE_MS, so a write that was stamped
+# but is not yet visible cannot be skipped by a cursor.
+SYNC_LOG_RETENTION_DAYS = int(os.environ.get('SYNC_LOG_RETENTION_DAYS', '7'))
+SYNC_PAGE_SIZE = int(os.environ.get('SYNC_PAGE_SIZE', '500'))
+SYNC_SETTLE_MS = int(os.environ.get('SYNC_SETTLE_MS', '1000'))
+
+# Seller reputation: counts cover all offers, medians the latest
+# REPUTATION_SAMPLE_SIZE offers of each seller
+REPUTATION_SAMPLE_SIZE = int(os.environ.get('REPUTATION_SAMPLE_SIZE', '200'))
+REPUTATION_RECOMPUTE_BATCH_SIZE = int(os.environ.get('REPUTATION_RECOMPUTE_BATCH_SIZE', '1000'))
+
+# Response compression: bodies of at least COMPRESSION_MIN_BYTES are sent with
+# brotli (if installed) or gzip, whichever the client prefers. Chunks of
+# COMPRESSION_OFFLOAD_BYTES or more are compressed in the default executor so
+# large payloads do not hold up the event loop.
+COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+COMPRESSION_OFFLOAD_BYTES = int(os.environ.get('COMPRESSION_OFFLOAD_BYTES', '65536'))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '4'))
+
+# Logging: records are queued by the emitting code and written by a background
+# thread as JSON lines (LOG_FORMAT=text for the plain format). Only a
+# LOG_INFO_SAMPLE_RATE share of INFO and lower records is kept; warnings and
+# errors always are. Records that find the LOG_QUEUE_SIZE queue full are
+# dropped rather than blocking the event loop.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+LOG_INFO_SAMPLE_RATE = float(os.environ.get('LOG_INFO_SAMPLE_RATE', '1.0'))
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+
+# Request view and impression counters are buffered per worker and written
+# every COUNTER_FLUSH_SECONDS as one bulk $inc. At most COUNTER_MAX_KEYS
+# requests are buffered (further increments are dropped and counted), and a
+# flush starts early once COUNTER_MAX_UNFLUSHED increments are pending: that
+# is how many a crashed worker can lose.
+COUNTER_FLUSH_SECONDS = float(os.environ.get('COUNTER_FLUSH_SECONDS', '10'))
+COUNTER_MAX_KEYS = int(os.environ.get('COUNTER_MAX_KEYS', '50000'))
+COUNTER_MAX_UNFLUSHED = int(os.environ.get('COUNTER_MAX_UNFLUSHED', '10000'))
+
+# Message storage: "documents" keeps one document per message in `messages`,
+# "buckets" appends messages into count-bounded documents in `message_buckets`
+MESSAGE_STORAGE_MODE = os.environ.get('MESSAGE_STORAGE_MODE', 'documents')
+MESSAGE_BUCKET_SIZE = int(os.environ.get('MESSAGE_BUCKET_SIZE', '200'))
+
+# Ids
+def new_id() -> str:
+    # UUIDv7: a 48-bit millisecond timestamp ahead of the random bits, so ids
+    # sort by creation time and index inserts stay right-leaning
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = (value & ~(0xF << 76)) | (0x7 << 76)
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)
+    return str(uuid.UUID(int=value))
+
+def to_db_id(value):
+    if ID_STORAGE_FORMAT == "string" or not isinstance(value, str):
+        return value
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        return value
+
+def id_forms(value) -> list:
+    # Accepts API ids and stored ids alike: in dual mode a document may hold
+    # the other form than the one read from a related document
+    value = api_id(value)
+    if ID_STORAGE_FORMAT == "dual" and isinstance(value, str):
+        return [to_db_id(value), value]
+    return [to_db_id(value)]
+
+def id_filter(value):
+    """Query value matching an id in the stored id format(s)."""
+    forms = id_forms(value)
+    return forms[0] if len(forms) == 1 else {"$in": forms}
+
+def ids_filter(values) -> dict:
+    """Query value matching any of `values` in the stored id format(s)."""
+    return {"$in": [form for value in values for form in id_forms(value)]}
+
+def to_db_doc(doc: dict) -> dict:
+    return {key: to_db_id(value) if key in ID_FIELDS else value for key, value in doc.items()}
+
+def api_id(value):
+    return str(value) if isinstance(value, uuid.UUID) else value
+
 # Models
-class User(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+class Document(BaseModel):
+    # Documents read back from Mongo may carry binary UUIDs; the API speaks strings
+    @field_validator(*ID_FIELDS, mode="before", check_fields=False)
+    @classmethod
+    def _api_ids(cls, value):
+        return api_id(value)
+
+class User(Document):
+    id: str = Field(default_factory=new_id)
     email: str
     full_name: str
     user_type: str  # "customer" or "seller"
@@ -61,8 +362,8 @@ class UserLogin(BaseModel):
     email: str
     password: str
 
-class Request(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+class Request(Document):
+    id: str = Field(default_factory=new_id)
     customer_id: str
     title: str
     description: str
@@ -73,8 +374,11 @@ class Request(BaseModel):
     timeline: Optional[str] = None
     images: List[str] = []
     quantity: int = 1
-    status: str = "open"  # "open", "offer_accepted", "completed", "cancelled"
+    status: str = "open"  # "open", "offer_accepted", "completed", "cancelled", "expired"
+    duplicate_of: Optional[str] = None  # earlier open request of the same customer
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    version: int = 1  # incremented on every update
 
 class RequestCreate(BaseModel):
     title: str
@@ -87,8 +391,8 @@ class RequestCreate(BaseModel):
     images: List[str] = []
     quantity: int = 1
 
-class Offer(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+class Offer(Document):
+    id: str = Field(default_factory=new_id)
     request_id: str
     seller_id: str
     price: float
@@ -96,8 +400,26 @@ class Offer(BaseModel):
     delivery_details: str
     images: List[str] = []
     terms: Optional[str] = None
-    status: str = "pending"  # "pending", "accepted", "declined"
+    status: str = "pending"  # "pending", "accepted", "declined", "expired"
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    version: int = 1  # incremented on every update
+
+class SellerReputation(BaseModel):
+    offers_made: int = 0
+    offers_accepted: int = 0
+    accepted_ratio: float = 0.0
+    median_price_to_budget: Optional[float] = None  # offer price / request budget_max
+    median_response_seconds: Optional[float] = None  # request created -> offer made
+
+class RequestStats(BaseModel):
+    views: int = 0  # GET /requests/{id} by anyone but the owner
+    impressions: int = 0  # appearances in sellers' listings
+
+class OfferWithSeller(Offer):
+    seller_name: Optional[str] = None
+    seller_location: Optional[str] = None
+    seller_reputation: Optional[SellerReputation] = None
 
 class OfferCreate(BaseModel):
     request_id: str
@@ -107,8 +429,8 @@ class OfferCreate(BaseModel):
     images: List[str] = []
     terms: Optional[str] = None
 
-class Message(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+class Message(Document):
+    id: str = Field(default_factory=new_id)
     request_id: str
     offer_id: Optional[str] = None
     sender_id: str
@@ -135,18 +457,414 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(hours=24)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "typ": "access"})
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
+def conversation_key(request_id, user_a, user_b) -> str:
+    first, second = sorted([api_id(user_a), api_id(user_b)])
+    return f"{api_id(request_id)}:{first}:{second}"
+
+async def append_message_to_bucket(buckets, message_doc: dict):
+    # Fill the open bucket of the conversation; once every bucket is full the
+    # filter matches nothing and the upsert starts a new one
+    key = conversation_key(message_doc["request_id"], message_doc["sender_id"], message_doc["receiver_id"])
+    await buckets.update_one(
+        {"conversation_key": key, "count": {"$lt": MESSAGE_BUCKET_SIZE}},
+        {
+            "$push": {"messages": to_db_doc(message_doc)},
+            "$inc": {"count": 1},
+            "$min": {"first_at": message_doc["created_at"]},
+            "$max": {"last_at": message_doc["created_at"]},
+            "$setOnInsert": {"request_id": to_db_id(message_doc["request_id"])},
+        },
+        upsert=True
+    )
+
+async def read_bucketed_conversation(buckets, key: str, limit: int = 100) -> List[dict]:
+    # Newest buckets first, stop as soon as enough messages are collected
+    messages = []
+    cursor = buckets.find({"conversation_key": key}, {"messages": 1}).sort("last_at", -1)
+    async for bucket in cursor:
+        messages.extend(bucket["messages"])
+        if len(messages) >= limit:
+            break
+    messages.sort(key=lambda msg: msg["created_at"])
+    return messages[-limit:]
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN or not hmac.compare_digest(x_admin_token or "", ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+# In-process counters and gauges, served by /api/metrics
+metrics: Dict[str, float] = defaultdict(float)
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entry."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        if key not in self._data:
+            return default
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def set(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        return self._data.pop(key, default)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+idempotency_cache = LRUCache(IDEMPOTENCY_CACHE_SIZE)
+
+# user id -> (cluster time, operation time) of that user's last write
+causal_write_times = LRUCache(CAUSAL_SESSION_CACHE_SIZE)
+# user id -> time.monotonic() when that user's last write finished
+user_write_times = LRUCache(CAUSAL_SESSION_CACHE_SIZE)
+
+def encode_causal_token(user_id: str, times: Optional[tuple], written_at: float) -> str:
+    # Cluster times carry BSON types (and the cluster's signature), so they
+    # travel as BSON inside a JWT. Its "typ" keeps get_current_user from
+    # taking it as an access token.
+    payload = {
+        "sub": user_id,
+        "typ": "causal",
+        "exp": datetime.utcnow() + timedelta(seconds=CAUSAL_TOKEN_SECONDS),
+        "written_at": written_at,
+        "times": None
+    }
+    if times is not None:
+        raw = bson.encode({"cluster_time": times[0], "operation_time": times[1]})
+        payload["times"] = base64.urlsafe_b64encode(raw).decode('ascii')
+    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+def decode_causal_token(token: str, user_id: str) -> Optional[tuple]:
+    """(times, written_at) from the user's causal token, or None if it is
+    missing, malformed, expired or someone else's."""
+    try:
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM], options={"require": ["exp"]})
+        if payload.get("typ") != "causal" or payload.get("sub") != user_id:
+            return None
+        times = None
+        if payload.get("times"):
+            raw = bson.decode(base64.urlsafe_b64decode(payload["times"]))
+            times = (raw["cluster_time"], raw["operation_time"])
+        return times, float(payload["written_at"])
+    except (jwt.PyJWTError, bson.errors.BSONError, KeyError, TypeError, ValueError):
+        return None
+
+def request_causal_token(user_id: str) -> Optional[tuple]:
+    context = log_context.get()
+    token = context.get("causal_token_received") if context is not None else None
+    return decode_causal_token(token, user_id) if token else None
+
+@asynccontextmanager
+async def user_session(user_id: str, write: bool = False):
+    """Causally consistent session that starts after the user's last write.
+    
+    The last write is the later of the one this worker saw and the one in the
+    request's causal token. Writes made in the session advance the user's
+    stored time and the token returned to the client, and reads made in it
+    (also on secondaries) wait until that write is visible.
+    """
+    async with await client.start_session(causal_consistency=True) as session:
+        times = causal_write_times.get(user_id)
+        received = request_causal_token(user_id)
+        if received is not None and received[0] is not None and (times is None or received[0][1] > times[1]):
+            times = received[0]
+        if times is not None:
+            session.advance_cluster_time(times[0])
+            session.advance_operation_time(times[1])
+        yield session
+        if session.operation_time is not None and (times is None or session.operation_time > times[1]):
+            times = (session.cluster_time, session.operation_time)
+            causal_write_times.set(user_id, times)
+    if write:
+        user_write_times.set(user_id, time.monotonic())
+        context = log_context.get()
+        if context is not None:
+            context["causal_token"] = encode_causal_token(user_id, times, time.time())
+
+class SingleFlight:
+    """Shares one in-flight call, and optionally its result for `ttl` seconds,
+    among callers asking for the same key.
+    
+    The call runs in its own task, so a caller that goes away (a client
+    disconnect cancelling its handler) does not cancel it for the others.
+    """
+
+    def __init__(self, name: str, ttl: float = 0.0, maxsize: int = 1000):
+        self.name = name
+        self.ttl = ttl
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+        self._recent = LRUCache(maxsize)
+        self._generation = 0
+
+    async def do(self, key: tuple, load):
+        recent = self._recent.get(key)
+        if recent is not None and recent[0] > time.monotonic():
+            self._record(shared=True)
+            return recent[1]
+        task = self._inflight.get(key)
+        if task is None:
+            self._record(shared=False)
+            task = asyncio.create_task(load())
+            self._inflight[key] = task
+            generation = self._generation
+            task.add_done_callback(lambda done: self._finish(key, done, generation))
+        else:
+            self._record(shared=True)
+        return await asyncio.shield(task)
+
+    def _record(self, shared: bool):
+        prefix = f"single_flight.{self.name}"
+        metrics[f"{prefix}.calls"] += 1
+        metrics[f"{prefix}.shared"] += shared
+        metrics[f"{prefix}.coalescing_ratio"] = metrics[f"{prefix}.shared"] / metrics[f"{prefix}.calls"]
+
+    def _finish(self, key: tuple, task: asyncio.Task, generation: int):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        # A load that started before an invalidation may have read old data
+        if self.ttl > 0 and generation == self._generation:
+            self._recent.set(key, (time.monotonic() + self.ttl, task.result()))
+
+    def invalidate(self, keys: Optional[List[tuple]] = None):
+        """Drops cached results for `keys` (all of them when None); calls
+        already in flight finish for their callers but are not cached."""
+        self._generation += 1
+        if keys is None:
+            self._recent.clear()
+            self._inflight.clear()
+            return
+        for key in keys:
+            self._recent.pop(key)
+            self._inflight.pop(key, None)
+
+def wrote_recently(user_id: Optional[str]) -> bool:
+    # Writes on this worker, or on another one as reported by the causal token
+    if not user_id:
+        return False
+    written_at = user_write_times.get(user_id)
+    if written_at is not None and time.monotonic() - written_at < SINGLE_FLIGHT_WRITE_GRACE_SECONDS:
+        return True
+    received = request_causal_token(user_id)
+    return received is not None and time.time() - received[1] < SINGLE_FLIGHT_WRITE_GRACE_SECONDS
+
+async def read_coalesced(flight: SingleFlight, key: tuple, user_id: Optional[str], load):
+    # The user's own recent writes must be visible, so they read alone
+    if not SINGLE_FLIGHT_ENABLED or wrote_recently(user_id):
+        return await load()
+    return await flight.do(key, load)
+
+open_requests_flight = SingleFlight("open_requests", SINGLE_FLIGHT_TTL_SECONDS, SINGLE_FLIGHT_CACHE_SIZE)
+request_flight = SingleFlight("request", SINGLE_FLIGHT_TTL_SECONDS, SINGLE_FLIGHT_CACHE_SIZE)
+request_facets_flight = SingleFlight("request_facets", FACET_CACHE_SECONDS, SINGLE_FLIGHT_CACHE_SIZE)
+user_flight = SingleFlight("users", USER_CACHE_SECONDS, USER_CACHE_SIZE)
+
+class InvalidationBus:
+    """Broadcasts cache invalidations to every worker.
+
+    `publish` applies an invalidation locally and appends it to a capped
+    collection; `run` tails that collection and applies the invalidations
+    other workers publish. Handlers take a list of keys, or None for
+    "everything", which they get whenever invalidations may have been missed.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, List[tuple]] = defaultdict(list)
+        # With the memory backend there is a single process and nothing to tail
+        self.live = STORAGE_BACKEND == "memory"
+
+    def subscribe(self, namespace: str, handler: Callable[[Optional[List[str]]], None], local: bool = True):
+        """Registers `handler` for `namespace`; with local=False it only sees
+        other workers' invalidations (for caches the writer updates itself)."""
+        self._handlers[namespace].append((handler, local))
+
+    def _apply(self, namespace: str, keys: Optional[List[str]], remote: bool):
+        for handler, local in self._handlers.get(namespace, []):
+            if remote or local:
+                handler(keys)
+
+    def _apply_all(self):
+        for namespace in list(self._handlers):
+            self._apply(namespace, None, remote=True)
+
+    async def publish(self, namespace: str, keys: List[str]):
+        if namespace not in self._handlers or not keys:
+            return
+        self._apply(namespace, keys, remote=False)
+        metrics[f"cache_bus.{namespace}.published"] += len(keys)
+        if STORAGE_BACKEND == "memory" or not CACHE_BUS_ENABLED:
+            return
+        try:
+            await db.cache_invalidations.insert_one({
+                "namespace": namespace, "keys": keys, "worker": WORKER_ID, "at": datetime.utcnow()
+            })
+        except Exception:
+            # Other workers keep stale entries until their TTLs run out
+            metrics["cache_bus.publish_errors"] += 1
+            logger.exception("Publishing %s cache invalidation failed", namespace)
+
+    async def _tail(self):
+        # Capped collections keep insertion order. Tail from the start and
+        # apply only what follows our own marker, so nothing published after
+        # the caches were cleared is skipped whatever the writers' clocks say.
+        marker = await db.cache_invalidations.insert_one({"namespace": None, "worker": WORKER_ID, "at": datetime.utcnow()})
+        cursor = db.cache_invalidations.find({}, cursor_type=CursorType.TAILABLE_AWAIT).max_await_time_ms(CACHE_BUS_AWAIT_MS)
+        seen_marker = False
+        while cursor.alive:
+            async for doc in cursor:
+                if not seen_marker:
+                    seen_marker = doc["_id"] == marker.inserted_id
+                    if seen_marker:
+                        self._apply_all()
+                        self.live = True
+                        metrics["cache_bus.live"] = 1
+                    continue
+                if doc["worker"] != WORKER_ID and doc["namespace"] is not None:
+                    self._apply(doc["namespace"], doc["keys"], remote=True)
+                    metrics[f"cache_bus.{doc['namespace']}.received"] += len(doc["keys"])
+
+    async def run(self):
+        try:
+            await db.create_collection("cache_invalidations", capped=True, size=CACHE_BUS_BYTES)
+        except CollectionInvalid:
+            # Already created, possibly by another worker; it cannot be tailed
+            # unless capped
+            options = await db.cache_invalidations.options()
+            if not options.get("capped"):
+                logger.error("cache_invalidations exists but is not capped; drop it to enable the cache bus")
+        delay = 1.0
+        while True:
+            try:
+                await self._tail()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                metrics["cache_bus.errors"] += 1
+                logger.exception("Cache invalidation tail failed")
+            # A tail that went live starts the backoff over
+            if self.live:
+                delay = 1.0
+            # Invalidations may be missed until the tail is back
+            self.live = False
+            metrics["cache_bus.live"] = 0
+            self._apply_all()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, CACHE_BUS_RETRY_MAX_SECONDS)
+
+invalidation_bus = InvalidationBus()
+invalidation_bus.subscribe("users", lambda keys: user_flight.invalidate(None if keys is None else [(key,) for key in keys]))
+invalidation_bus.subscribe("requests", lambda keys: request_flight.invalidate(None if keys is None else [(key,) for key in keys]))
+invalidation_bus.subscribe("requests", lambda keys: open_requests_flight.invalidate())
+
+def replay_idempotent_response(record: dict, fingerprint: str, model):
+    if record["fingerprint"] != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request body")
+    return model(**record["response"])
+
+async def run_idempotent(scope: str, key: Optional[str], user_id: str, payload: dict, model, create):
+    # Without a key every call creates; with one, the first call reserves the
+    # key and stores its response, and repeats replay that response
+    if not key:
+        return await create()
+    
+    record_id = f"{user_id}:{scope}:{key}"
+    fingerprint = hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    
+    cached = idempotency_cache.get(record_id)
+    if cached is not None and cached["expires_at"] > time.monotonic():
+        metrics["idempotency.cache_hits"] += 1
+        return replay_idempotent_response(cached, fingerprint, model)
+    
+    now = datetime.utcnow()
+    lease = {"fingerprint": fingerprint, "lease": new_id(),
+             "pending_until": now + timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS)}
+    try:
+        await db.idempotency_keys.insert_one({"_id": record_id, "status": "pending", "created_at": now, **lease})
+    except DuplicateKeyError:
+        record = await db.idempotency_keys.find_one({"_id": record_id})
+        in_progress = "A request with this Idempotency-Key is still in progress"
+        if record is None:
+            raise HTTPException(status_code=409, detail=in_progress)
+        if record["status"] == "completed":
+            metrics["idempotency.replays"] += 1
+            record["expires_at"] = time.monotonic() + IDEMPOTENCY_TTL_SECONDS
+            idempotency_cache.set(record_id, record)
+            return replay_idempotent_response(record, fingerprint, model)
+        
+        # The first attempt's lease has run out: take the key over, unless
+        # another retry got there first. Records from before leases only
+        # have created_at.
+        pending_until = record.get("pending_until") or record["created_at"] + timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS)
+        if pending_until > now:
+            raise HTTPException(status_code=409, detail=in_progress)
+        taken = await db.idempotency_keys.update_one(
+            {"_id": record_id, "status": "pending", "lease": record.get("lease")},
+            {"$set": lease}
+        )
+        if taken.modified_count != 1:
+            raise HTTPException(status_code=409, detail=in_progress)
+        metrics["idempotency.takeovers"] += 1
+    
+    try:
+        result = await create()
+    except BaseException:
+        # Release the key so the client can retry a failed request
+        await db.idempotency_keys.delete_one({"_id": record_id, "lease": lease["lease"]})
+        raise
+    
+    # Stored JSON-encoded so replays match the original response exactly
+    response = jsonable_encoder(result)
+    await db.idempotency_keys.update_one(
+        {"_id": record_id, "lease": lease["lease"]},
+        {"$set": {"status": "completed", "response": response}}
+    )
+    idempotency_cache.set(record_id, {
+        "fingerprint": fingerprint,
+        "response": response,
+        "expires_at": time.monotonic() + IDEMPOTENCY_TTL_SECONDS
+    })
+    return result
+
+async def load_user(user_id: str) -> Optional[dict]:
+    async def load():
+        return await db.users.find_one({"id": id_filter(user_id)})
+    
+    # Cached user documents carry subscription status, so they are only
+    # trusted while other workers' invalidations are arriving
+    if not invalidation_bus.live:
+        return await load()
+    return await user_flight.do((user_id,), load)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
-        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM],
+                             options={"require": ["exp"]})
         user_id: str = payload.get("sub")
-        if user_id is None:
+        # Tokens issued before "typ" was added are access tokens
+        if user_id is None or payload.get("typ", "access") != "access":
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+        context = log_context.get()
+        if context is not None:
+            context["user_id"] = user_id
         
-        user = await db.users.find_one({"id": user_id})
+        user = await load_user(user_id)
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
         
@@ -173,7 +891,7 @@ async def register(user_data: UserCreate):
     # Store user with hashed password
     user_doc = user.dict()
     user_doc["password"] = hashed_password
-    await db.users.insert_one(user_doc)
+    await db.users.insert_one(to_db_doc(user_doc))
     
     # Create access token
     access_token = create_access_token(data={"sub": user.id})
@@ -196,7 +914,7 @@ async def login(login_data: UserLogin):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     # Create access token
-    access_token = create_access_token(data={"sub": user_doc["id"]})
+    access_token = create_access_token(data={"sub": api_id(user_doc["id"])})
     
     # Remove password from response
     del user_doc["password"]
@@ -214,16 +932,33 @@ async def get_profile(current_user: User = Depends(get_current_user)):
 
 # Request Routes
 @api_router.post("/requests", response_model=Request)
-async def create_request(request_data: RequestCreate, current_user: User = Depends(get_current_user)):
+async def create_request(
+    request_data: RequestCreate,
+    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None)
+):
     if current_user.user_type != "customer":
         raise HTTPException(status_code=403, detail="Only customers can create requests")
     
-    request_dict = request_data.dict()
-    request_dict["customer_id"] = current_user.id
-    request_obj = Request(**request_dict)
+    async def create():
+        request_dict = request_data.dict()
+        request_dict["customer_id"] = current_user.id
+        request_obj = Request(**request_dict)
+        
+        if DUPLICATE_DETECTION_ENABLED:
+            signature = request_duplicates.signature(request_text(request_dict))
+            request_obj.duplicate_of = find_duplicate_request(current_user.id, signature)
+        
+        async with user_session(current_user.id, write=True) as session:
+            await db.requests.insert_one(to_db_doc(request_obj.dict()), session=session)
+        open_requests.upsert(request_obj)
+        if DUPLICATE_DETECTION_ENABLED:
+            index_request_signature(request_obj.dict(), signature)
+        await log_changes("requests", [request_obj.dict()])
+        await invalidation_bus.publish("requests", [request_obj.id])
+        return request_obj
     
-    await db.requests.insert_one(request_obj.dict())
-    return request_obj
+    return await run_idempotent("requests", idempotency_key, current_user.id, request_data.dict(), Request, create)
 
 @api_router.get("/requests", response_model=List[Request])
 async def get_requests(
@@ -231,9 +966,19 @@ async def get_requests(
     min_budget: Optional[float] = None,
     max_budget: Optional[float] = None,
     location: Optional[str] = None,
+    collapse_duplicates: bool = True,
     current_user: User = Depends(get_current_user)
 ):
-    # Build filter
+    requests = await find_open_requests(category, min_budget, max_budget, location, collapse_duplicates, current_user.id)
+    count_impressions(requests, current_user)
+    return requests
+
+def build_request_filter(
+    category: Optional[str] = None,
+    min_budget: Optional[float] = None,
+    max_budget: Optional[float] = None,
+    location: Optional[str] = None
+) -> dict:
     filter_dict = {"status": "open"}
     
     if category:
@@ -248,83 +993,215 @@ async def get_requests(
     if location:
         filter_dict["location"] = {"$regex": location, "$options": "i"}
     
-    requests = await db.requests.find(filter_dict).sort("created_at", -1).to_list(100)
-    return [Request(**req) for req in requests]
+    return filter_dict
+
+async def find_open_requests(
+    category: Optional[str] = None,
+    min_budget: Optional[float] = None,
+    max_budget: Optional[float] = None,
+    location: Optional[str] = None,
+    collapse_duplicates: bool = True,
+    user_id: Optional[str] = None
+) -> List[Request]:
+    requests = None
+    if open_requests.ready:
+        requests = open_requests.query(category, min_budget, max_budget, location)
+    if requests is None:
+        metrics["open_requests.snapshot_misses"] += 1
+        filter_dict = build_request_filter(category, min_budget, max_budget, location)
+        
+        async def load():
+            async with user_session(user_id) as session:
+                cursor = replica_db.requests.find(filter_dict, session=session).sort("created_at", -1)
+                return [Request(**req) for req in await cursor.to_list(100)]
+        
+        key = (category, min_budget, max_budget, location)
+        requests = await read_coalesced(open_requests_flight, key, user_id, load)
+    else:
+        metrics["open_requests.snapshot_hits"] += 1
+    if collapse_duplicates:
+        requests = collapse_duplicate_requests(requests)
+    return requests
+
+@api_router.get("/requests/facets")
+async def get_request_facets(
+    category: Optional[str] = None,
+    min_budget: Optional[float] = None,
+    max_budget: Optional[float] = None,
+    location: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    key = (category, min_budget, max_budget, location)
+    return await request_facets_flight.do(key, lambda: count_request_facets(category, min_budget, max_budget, location))
+
+async def count_request_facets(
+    category: Optional[str] = None,
+    min_budget: Optional[float] = None,
+    max_budget: Optional[float] = None,
+    location: Optional[str] = None
+) -> dict:
+    # Counts of the open requests matching the filters, per category, budget
+    # range and location, all from one aggregation
+    by_count = {"count": -1, "_id": 1}
+    pipeline = [
+        {"$match": build_request_filter(category, min_budget, max_budget, location)},
+        {"$facet": {
+            "total": [{"$count": "count"}],
+            "categories": [
+                {"$unwind": "$categories"},
+                {"$group": {"_id": "$categories", "count": {"$sum": 1}}},
+                {"$sort": by_count}
+            ],
+            "budget": [
+                {"$bucket": {
+                    "groupBy": "$budget_max",
+                    # $bucket sends values below the first boundary to the
+                    # default too, so they get a bucket of their own
+                    "boundaries": [float("-inf")] + FACET_BUDGET_BOUNDARIES,
+                    "default": "over",
+                    "output": {"count": {"$sum": 1}}
+                }}
+            ],
+            "locations": [
+                {"$group": {"_id": "$location", "count": {"$sum": 1}}},
+                {"$sort": by_count},
+                {"$limit": FACET_LOCATION_LIMIT}
+            ]
+        }}
+    ]
+    facets = (await replica_db.requests.aggregate(pipeline).to_list(1))[0]
+    
+    budget_counts = {bucket["_id"]: bucket["count"] for bucket in facets["budget"]}
+    edges = FACET_BUDGET_BOUNDARIES
+    budget = [
+        {"min": low, "max": high, "count": budget_counts.get(low, 0)}
+        for low, high in zip(edges, edges[1:])
+    ]
+    under = budget_counts.get(float("-inf"), 0)
+    if under:
+        budget.insert(0, {"min": None, "max": edges[0], "count": under})
+    budget.append({"min": edges[-1], "max": None, "count": budget_counts.get("over", 0)})
+    
+    return {
+        "total": facets["total"][0]["count"] if facets["total"] else 0,
+        "categories": [{"category": c["_id"], "count": c["count"]} for c in facets["categories"]],
+        "budget": budget,
+        "locations": [{"location": loc["_id"], "count": loc["count"]} for loc in facets["locations"]]
+    }
 
 @api_router.get("/requests/my")
 async def get_my_requests(current_user: User = Depends(get_current_user)):
     if current_user.user_type != "customer":
         raise HTTPException(status_code=403, detail="Only customers can view their requests")
     
-    requests = await db.requests.find({"customer_id": current_user.id}).sort("created_at", -1).to_list(100)
+    return await find_customer_requests(current_user)
+
+async def find_customer_requests(current_user: User) -> List[Request]:
+    async with user_session(current_user.id) as session:
+        cursor = replica_db.requests.find({"customer_id": id_filter(current_user.id)}, session=session)
+        requests = await cursor.sort("created_at", -1).to_list(100)
     return [Request(**req) for req in requests]
 
 @api_router.get("/requests/{request_id}")
 async def get_request(request_id: str, current_user: User = Depends(get_current_user)):
-    request_doc = await db.requests.find_one({"id": request_id})
+    async def load():
+        async with user_session(current_user.id) as session:
+            return await replica_db.requests.find_one({"id": id_filter(request_id)}, session=session)
+    
+    request_doc = await read_coalesced(request_flight, (request_id,), current_user.id, load)
     if not request_doc:
         raise HTTPException(status_code=404, detail="Request not found")
     
-    return Request(**request_doc)
+    request = Request(**request_doc)
+    if request.customer_id != current_user.id:
+        request_counters.add(request.id, "views")
+    return request
 
 # Offer Routes
 @api_router.post("/offers", response_model=Offer)
-async def create_offer(offer_data: OfferCreate, current_user: User = Depends(get_current_user)):
+async def create_offer(
+    offer_data: OfferCreate,
+    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None)
+):
     if current_user.user_type != "seller":
         raise HTTPException(status_code=403, detail="Only sellers can create offers")
     
-    # Check if request exists
-    request_doc = await db.requests.find_one({"id": offer_data.request_id})
-    if not request_doc:
-        raise HTTPException(status_code=404, detail="Request not found")
-    
-    # Check if seller already has an offer for this request
-    existing_offer = await db.offers.find_one({
-        "request_id": offer_data.request_id,
-        "seller_id": current_user.id
-    })
-    if existing_offer:
-        raise HTTPException(status_code=400, detail="You already have an offer for this request")
-    
-    offer_dict = offer_data.dict()
-    offer_dict["seller_id"] = current_user.id
-    offer_obj = Offer(**offer_dict)
+    async def create():
+        # Check if request exists
+        request_doc = await db.requests.find_one({"id": id_filter(offer_data.request_id)})
+        if not request_doc:
+            raise HTTPException(status_code=404, detail="Request not found")
+        
+        # Check if seller already has an offer for this request
+        existing_offer = await db.offers.find_one({
+            "request_id": id_filter(offer_data.request_id),
+            "seller_id": id_filter(current_user.id)
+        })
+        if existing_offer:
+            raise HTTPException(status_code=400, detail="You already have an offer for this request")
+        
+        offer_dict = offer_data.dict()
+        offer_dict["seller_id"] = current_user.id
+        offer_obj = Offer(**offer_dict)
+        
+        async with user_session(current_user.id, write=True) as session:
+            await db.offers.insert_one(to_db_doc(offer_obj.dict()), session=session)
+        await record_offer_made(offer_obj, request_doc)
+        await log_changes("offers", [offer_obj.dict()])
+        return offer_obj
     
-    await db.offers.insert_one(offer_obj.dict())
-    return offer_obj
+    return await run_idempotent("offers", idempotency_key, current_user.id, offer_data.dict(), Offer, create)
 
 @api_router.get("/offers/request/{request_id}")
 async def get_offers_for_request(request_id: str, current_user: User = Depends(get_current_user)):
     # Check if request exists and user has access
-    request_doc = await db.requests.find_one({"id": request_id})
+    request_doc = await db.requests.find_one({"id": id_filter(request_id)})
     if not request_doc:
         raise HTTPException(status_code=404, detail="Request not found")
     
     # Only request owner can see all offers
-    if current_user.user_type == "customer" and request_doc["customer_id"] != current_user.id:
+    if current_user.user_type == "customer" and api_id(request_doc["customer_id"]) != current_user.id:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    offers = await db.offers.find({"request_id": request_id}).sort("created_at", -1).to_list(100)
+    offers = await db.offers.find({"request_id": id_filter(request_doc["id"])}).sort("created_at", -1).to_list(100)
     
-    # Populate seller details
+    # Populate seller details and reputation, one query each for all sellers
+    seller_ids = list({api_id(offer["seller_id"]) for offer in offers})
+    seller_docs, reputations = await asyncio.gather(
+        db.users.find(
+            {"id": ids_filter(seller_ids)},
+            {"_id": 0, "id": 1, "full_name": 1, "business_name": 1, "location": 1}
+        ).to_list(len(seller_ids)),
+        load_seller_reputations(seller_ids)
+    )
+    sellers_by_id = {api_id(doc["id"]): doc for doc in seller_docs}
     for offer in offers:
-        seller = await db.users.find_one({"id": offer["seller_id"]})
+        seller_id = api_id(offer["seller_id"])
+        seller = sellers_by_id.get(seller_id)
         if seller:
             offer["seller_name"] = seller.get("business_name") or seller.get("full_name")
             offer["seller_location"] = seller.get("location")
+        offer["seller_reputation"] = reputations.get(seller_id)
     
-    return [Offer(**offer) for offer in offers]
+    return [OfferWithSeller(**offer) for offer in offers]
 
 @api_router.get("/offers/my")
 async def get_my_offers(current_user: User = Depends(get_current_user)):
     if current_user.user_type != "seller":
         raise HTTPException(status_code=403, detail="Only sellers can view their offers")
     
-    offers = await db.offers.find({"seller_id": current_user.id}).sort("created_at", -1).to_list(100)
+    return await find_seller_offers(current_user)
+
+async def find_seller_offers(current_user: User) -> List[Offer]:
+    offers = await db.offers.find({"seller_id": id_filter(current_user.id)}).sort("created_at", -1).to_list(100)
     
     # Populate request details
+    request_ids = list({api_id(offer["request_id"]) for offer in offers})
+    request_docs = await db.requests.find({"id": ids_filter(request_ids)}).to_list(len(request_ids))
+    requests_by_id = {api_id(doc["id"]): doc for doc in request_docs}
     for offer in offers:
-        request_doc = await db.requests.find_one({"id": offer["request_id"]})
+        request_doc = requests_by_id.get(api_id(offer["request_id"]))
         if request_doc:
             offer["request_title"] = request_doc["title"]
             offer["request_budget"] = f"KES {request_doc['budget_min']}-{request_doc['budget_max']}"
@@ -334,42 +1211,90 @@ async def get_my_offers(current_user: User = Depends(get_current_user)):
 @api_router.put("/offers/{offer_id}/accept")
 async def accept_offer(offer_id: str, current_user: User = Depends(get_current_user)):
     # Find offer
-    offer_doc = await db.offers.find_one({"id": offer_id})
+    offer_doc = await db.offers.find_one({"id": id_filter(offer_id)})
     if not offer_doc:
         raise HTTPException(status_code=404, detail="Offer not found")
     
     # Find request
-    request_doc = await db.requests.find_one({"id": offer_doc["request_id"]})
+    request_doc = await db.requests.find_one({"id": id_filter(offer_doc["request_id"])})
     if not request_doc:
         raise HTTPException(status_code=404, detail="Request not found")
     
     # Check if user is the request owner
-    if current_user.user_type != "customer" or request_doc["customer_id"] != current_user.id:
+    if current_user.user_type != "customer" or api_id(request_doc["customer_id"]) != current_user.id:
         raise HTTPException(status_code=403, detail="Only request owner can accept offers")
+    if offer_doc.get("status") != "pending" or request_doc.get("status") != "open":
+        raise HTTPException(status_code=409, detail="Offer is no longer open for acceptance")
     
-    # Update offer status
-    await db.offers.update_one({"id": offer_id}, {"$set": {"status": "accepted"}})
-    
-    # Update request status
-    await db.requests.update_one({"id": offer_doc["request_id"]}, {"$set": {"status": "offer_accepted"}})
-    
-    # Decline all other offers for this request
-    await db.offers.update_many(
-        {"request_id": offer_doc["request_id"], "id": {"$ne": offer_id}},
-        {"$set": {"status": "declined"}}
-    )
+    now = datetime.utcnow()
+    async with user_session(current_user.id, write=True) as session:
+        # Claim the request first: of two concurrent accepts only one moves
+        # it out of "open", the other gets a 409
+        claimed = await db.requests.update_one(
+            {"id": request_doc["id"], "status": "open"},
+            {"$set": {"status": "offer_accepted", "updated_at": now}, "$inc": {"version": 1}},
+            session=session
+        )
+        if claimed.modified_count != 1:
+            raise HTTPException(status_code=409, detail="Offer is no longer open for acceptance")
+        
+        # Update offer status, handing the request back if the offer was
+        # declined or expired in the meantime
+        accepted = await db.offers.update_one(
+            {"id": offer_doc["id"], "status": "pending"},
+            {"$set": {"status": "accepted", "updated_at": now}, "$inc": {"version": 1}},
+            session=session
+        )
+        if accepted.modified_count != 1:
+            await db.requests.update_one(
+                {"id": request_doc["id"], "status": "offer_accepted"},
+                {"$set": {"status": "open", "updated_at": datetime.utcnow()}, "$inc": {"version": 1}},
+                session=session
+            )
+            raise HTTPException(status_code=409, detail="Offer is no longer open for acceptance")
+        open_requests.remove(api_id(offer_doc["request_id"]))
+        unindex_request_signature(api_id(offer_doc["request_id"]))
+        
+        # Decline all other offers for this request
+        other_offers = {"request_id": id_filter(request_doc["id"]), "id": {"$ne": offer_doc["id"]}}
+        declined = await db.offers.find(
+            other_offers,
+            {"_id": 0, "id": 1, "seller_id": 1, "request_id": 1},
+            session=session
+        ).to_list(None)
+        await db.offers.update_many(
+            other_offers,
+            {"$set": {"status": "declined", "updated_at": now}, "$inc": {"version": 1}},
+            session=session
+        )
+    # Only reached when this call made the transition, so retries and
+    # concurrent accepts count once
+    await record_offer_accepted(api_id(offer_doc["seller_id"]))
+    await invalidation_bus.publish("requests", [api_id(offer_doc["request_id"])])
+    await log_changes("requests", [request_doc])
+    await log_changes("offers", [offer_doc] + declined)
     
     return {"message": "Offer accepted successfully"}
 
 # Messaging Routes
 @api_router.post("/messages", response_model=Message)
-async def send_message(message_data: MessageCreate, current_user: User = Depends(get_current_user)):
-    message_dict = message_data.dict()
-    message_dict["sender_id"] = current_user.id
-    message_obj = Message(**message_dict)
+async def send_message(
+    message_data: MessageCreate,
+    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None)
+):
+    async def create():
+        message_dict = message_data.dict()
+        message_dict["sender_id"] = current_user.id
+        message_obj = Message(**message_dict)
+        
+        if MESSAGE_STORAGE_MODE == "buckets":
+            await append_message_to_bucket(db.message_buckets, message_obj.dict())
+        else:
+            await db.messages.insert_one(to_db_doc(message_obj.dict()))
+        return message_obj
     
-    await db.messages.insert_one(message_obj.dict())
-    return message_obj
+    return await run_idempotent("messages", idempotency_key, current_user.id, message_data.dict(), Message, create)
 
 @api_router.get("/messages/conversation/{request_id}")
 async def get_conversation(
@@ -377,11 +1302,17 @@ async def get_conversation(
     other_user_id: str,
     current_user: User = Depends(get_current_user)
 ):
+    if MESSAGE_STORAGE_MODE == "buckets":
+        # Bucketed conversations return the latest 100 messages, oldest first
+        key = conversation_key(request_id, current_user.id, other_user_id)
+        messages = await read_bucketed_conversation(db.message_buckets, key)
+        return [Message(**msg) for msg in messages]
+    
     messages = await db.messages.find({
-        "request_id": request_id,
+        "request_id": id_filter(request_id),
         "$or": [
-            {"sender_id": current_user.id, "receiver_id": other_user_id},
-            {"sender_id": other_user_id, "receiver_id": current_user.id}
+            {"sender_id": id_filter(current_user.id), "receiver_id": id_filter(other_user_id)},
+            {"sender_id": id_filter(other_user_id), "receiver_id": id_filter(current_user.id)}
         ]
     }).sort("created_at", 1).to_list(100)
     
@@ -390,13 +1321,22 @@ async def get_conversation(
 # Dashboard data
 @api_router.get("/dashboard/stats")
 async def get_dashboard_stats(current_user: User = Depends(get_current_user)):
+    return await load_dashboard_stats(current_user)
+
+async def load_dashboard_stats(current_user: User) -> Optional[dict]:
     if current_user.user_type == "customer":
         # Customer stats
-        total_requests = await db.requests.count_documents({"customer_id": current_user.id})
-        active_requests = await db.requests.count_documents({"customer_id": current_user.id, "status": "open"})
-        total_offers = await db.offers.count_documents({
-            "request_id": {"$in": [req["id"] for req in await db.requests.find({"customer_id": current_user.id}).to_list(1000)]}
-        })
+        customer_id = id_filter(current_user.id)
+        
+        async def count_offers_received():
+            requests = await db.requests.find({"customer_id": customer_id}, {"id": 1}).to_list(1000)
+            return await db.offers.count_documents({"request_id": ids_filter(req["id"] for req in requests)})
+        
+        total_requests, active_requests, total_offers = await asyncio.gather(
+            db.requests.count_documents({"customer_id": customer_id}),
+            db.requests.count_documents({"customer_id": customer_id, "status": "open"}),
+            count_offers_received()
+        )
         
         return {
             "total_requests": total_requests,
@@ -406,9 +1346,12 @@ async def get_dashboard_stats(current_user: User = Depends(get_current_user)):
     
     elif current_user.user_type == "seller":
         # Seller stats
-        total_offers = await db.offers.count_documents({"seller_id": current_user.id})
-        accepted_offers = await db.offers.count_documents({"seller_id": current_user.id, "status": "accepted"})
-        pending_offers = await db.offers.count_documents({"seller_id": current_user.id, "status": "pending"})
+        seller_id = id_filter(current_user.id)
+        total_offers, accepted_offers, pending_offers = await asyncio.gather(
+            db.offers.count_documents({"seller_id": seller_id}),
+            db.offers.count_documents({"seller_id": seller_id, "status": "accepted"}),
+            db.offers.count_documents({"seller_id": seller_id, "status": "pending"})
+        )
         
         return {
             "total_offers": total_offers,
@@ -416,39 +1359,1558 @@ async def get_dashboard_stats(current_user: User = Depends(get_current_user)):
             "pending_offers": pending_offers
         }
 
+@api_router.get("/dashboard/bootstrap")
+async def get_dashboard_bootstrap(current_user: User = Depends(get_current_user)):
+    # Everything the dashboard shows on first paint, resolved for one user and
+    # loaded concurrently
+    sections = {"stats": load_dashboard_stats(current_user)}
+    if current_user.user_type == "customer":
+        sections["my_requests"] = find_customer_requests(current_user)
+    elif current_user.user_type == "seller":
+        sections["requests"] = find_open_requests(user_id=current_user.id)
+        sections["my_offers"] = find_seller_offers(current_user)
+    
+    timings_ms = {}
+    
+    async def timed(name, coro):
+        started = time.perf_counter()
+        result = await coro
+        timings_ms[name] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+    
+    sync_cursor = await current_sync_cursor()
+    results = await asyncio.gather(*(timed(name, coro) for name, coro in sections.items()))
+    if "requests" in sections:
+        count_impressions(results[list(sections).index("requests")], current_user)
+    return {
+        "user": current_user,
+        "categories": CATEGORIES,
+        **dict(zip(sections, results)),
+        "sync_cursor": sync_cursor,
+        "timings_ms": timings_ms
+    }
+
 # Categories endpoint
+CATEGORIES = [
+    "Apparel & Fashion",
+    "Electronics & Gadgets", 
+    "Home & Garden",
+    "Automotive",
+    "Services",
+    "Books & Media",
+    "Custom Items",
+    "Food & Beverages",
+    "Health & Beauty",
+    "Sports & Recreation"
+]
+
 @api_router.get("/categories")
 async def get_categories():
+    return CATEGORIES
+
+# Metrics endpoint
+@api_router.get("/metrics", dependencies=[Depends(require_admin)])
+async def get_metrics():
+    return dict(metrics)
+
+# Slow-query report
+@api_router.get("/admin/slow-queries", dependencies=[Depends(require_admin)])
+async def get_slow_queries(limit: int = 100):
+    entries = await db.slow_queries.find({}, {"_id": 0}).sort("$natural", -1).to_list(min(limit, 1000))
+    return entries
+
+# Read routing report: reads served by each replica set member since startup
+@api_router.get("/admin/read-routing", dependencies=[Depends(require_admin)])
+async def get_read_routing():
+    roles = {}
+    if STORAGE_BACKEND != "memory":
+        primary = client.primary
+        if primary is not None:
+            roles[f"{primary[0]}:{primary[1]}"] = "primary"
+        for host, port in client.secondaries:
+            roles[f"{host}:{port}"] = "secondary"
+    reads = {key[len("reads."):]: count for key, count in metrics.items() if key.startswith("reads.")}
+    total = sum(reads.values())
+    return {
+        "read_preference": STALE_READ_PREFERENCE,
+        "members": {
+            member: {"role": roles.get(member, "unknown"), "reads": count, "share": count / total}
+            for member, count in sorted(reads.items())
+        }
+    }
+
+# Lifecycle sweeper
+def lifecycle_policies(now: datetime):
+    # (name, collection, filter, $set) for every enabled policy
+    policies = [
+        ("trial_expiry", db.users,
+         {"subscription_status": "trial", "trial_expires_at": {"$lt": now}},
+         {"subscription_status": "expired"}),
+    ]
+    if REQUEST_RETENTION_DAYS:
+        policies.append(("stale_requests", db.requests,
+                         {"status": "open", "created_at": {"$lt": now - timedelta(days=REQUEST_RETENTION_DAYS)}},
+                         {"status": "expired"}))
+    if OFFER_RETENTION_DAYS:
+        policies.append(("stale_offers", db.offers,
+                         {"status": "pending", "created_at": {"$lt": now - timedelta(days=OFFER_RETENTION_DAYS)}},
+                         {"status": "expired"}))
+    return policies
+
+async def sweep_policy(collection, filter_dict: dict, changes: dict) -> int:
+    # Bounded batches keep each update_many short; re-applying the filter makes
+    # a batch that another worker already swept a no-op
+    swept = 0
+    synced = collection.name in SYNCED_COLLECTIONS
+    projection = {"_id": 0, "id": 1, "customer_id": 1, "seller_id": 1, "request_id": 1}
+    while True:
+        batch = await collection.find(filter_dict, projection).limit(LIFECYCLE_SWEEP_BATCH_SIZE).to_list(LIFECYCLE_SWEEP_BATCH_SIZE)
+        if not batch:
+            break
+        ids = [doc["id"] for doc in batch]
+        update = {"$set": changes}
+        if synced:
+            update = {"$set": {**changes, "updated_at": datetime.utcnow()}, "$inc": {"version": 1}}
+        result = await collection.update_many({"id": {"$in": ids}, **filter_dict}, update)
+        swept += result.modified_count
+        if collection.name == "requests":
+            # Expired requests leave this worker's listing and duplicate index
+            # now; other workers drop them when the invalidation arrives
+            for doc_id in ids:
+                open_requests.remove(api_id(doc_id))
+                unindex_request_signature(api_id(doc_id))
+        await invalidation_bus.publish(collection.name, [api_id(doc_id) for doc_id in ids])
+        if synced:
+            await log_changes(collection.name, batch)
+        if len(batch) < LIFECYCLE_SWEEP_BATCH_SIZE:
+            break
+    return swept
+
+async def acquire_lease(name: str, seconds: float) -> bool:
+    now = datetime.utcnow()
+    try:
+        await db.leases.find_one_and_update(
+            {"_id": name, "expires_at": {"$lt": now}},
+            {"$set": {"owner": WORKER_ID, "expires_at": now + timedelta(seconds=seconds)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # The lease exists and has not expired: another worker holds it
+        return False
+    return True
+
+async def run_lifecycle_sweep():
+    if not await acquire_lease("lifecycle_sweep", LIFECYCLE_SWEEP_INTERVAL_SECONDS / 2):
+        metrics["lifecycle_sweep.skipped"] += 1
+        return
+    
+    pass_started = time.perf_counter()
+    for name, collection, filter_dict, changes in lifecycle_policies(datetime.utcnow()):
+        started = time.perf_counter()
+        swept = await sweep_policy(collection, filter_dict, changes)
+        elapsed = time.perf_counter() - started
+        metrics[f"lifecycle_sweep.{name}.swept"] += swept
+        metrics[f"lifecycle_sweep.{name}.last_swept"] = swept
+        metrics[f"lifecycle_sweep.{name}.last_seconds"] = elapsed
+        logger.info("Lifecycle sweep %s: %d documents in %.3fs", name, swept, elapsed)
+    metrics["lifecycle_sweep.passes"] += 1
+    metrics["lifecycle_sweep.last_seconds"] = time.perf_counter() - pass_started
+    metrics["lifecycle_sweep.last_completed_at"] = time.time()
+
+async def lifecycle_sweeper_loop():
+    while True:
+        jitter = random.uniform(-LIFECYCLE_SWEEP_JITTER, LIFECYCLE_SWEEP_JITTER)
+        await asyncio.sleep(LIFECYCLE_SWEEP_INTERVAL_SECONDS * (1 + jitter))
+        try:
+            await run_lifecycle_sweep()
+        except Exception:
+            metrics["lifecycle_sweep.errors"] += 1
+            logger.exception("Lifecycle sweep failed")
+
+# Near-duplicate detection
+MERSENNE_PRIME = (1 << 31) - 1
+
+class MinHashLSH:
+    """MinHash signatures over character shingles, indexed by LSH bands.
+
+    Two texts share a band bucket with high probability once their Jaccard
+    similarity passes roughly (1 / bands) ** (1 / rows), so a lookup only
+    compares against the few keys in matching buckets.
+    """
+
+    def __init__(self, num_perm: int, bands: int, shingle_size: int, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self._buckets = [defaultdict(set) for _ in range(bands)]
+        self._signatures: Dict[str, np.ndarray] = {}
+
+    def signature(self, text: str) -> np.ndarray:
+        text = " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+        size = self.shingle_size
+        shingles = {text[i:i + size] for i in range(max(len(text) - size + 1, 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) & MERSENNE_PRIME for s in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        return ((hashes[:, None] * self._a + self._b) % MERSENNE_PRIME).min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(len(self._buckets)):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, key: str, signature: np.ndarray):
+        self.remove(key)
+        self._signatures[key] = signature
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band][band_key].add(key)
+
+    def remove(self, key: str):
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for band, band_key in self._band_keys(signature):
+            bucket = self._buckets[band][band_key]
+            bucket.discard(key)
+            if not bucket:
+                del self._buckets[band][band_key]
+
+    def query(self, signature: np.ndarray, threshold: float) -> List[tuple]:
+        """(key, estimated Jaccard similarity) pairs above threshold, best first."""
+        candidates = set()
+        for band, band_key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(band_key, ()))
+        matches = [(key, float(np.mean(self._signatures[key] == signature))) for key in candidates]
+        return sorted((match for match in matches if match[1] >= threshold), key=lambda match: -match[1])
+
+    def __len__(self):
+        return len(self._signatures)
+
+request_duplicates = MinHashLSH(DUPLICATE_NUM_PERM, DUPLICATE_BANDS, DUPLICATE_SHINGLE_SIZE)
+# request id -> (customer_id, id of the first request in its duplicate group)
+request_duplicate_groups: Dict[str, tuple] = {}
+
+def request_text(request_doc) -> str:
+    return f"{request_doc['title']} {request_doc['description']}"
+
+def index_request_signature(request_doc: dict, signature: np.ndarray):
+    request_id = api_id(request_doc["id"])
+    request_duplicates.add(request_id, signature)
+    request_duplicate_groups[request_id] = (
+        api_id(request_doc["customer_id"]), api_id(request_doc.get("duplicate_of")) or request_id
+    )
+
+def unindex_request_signature(request_id: str):
+    request_duplicates.remove(request_id)
+    request_duplicate_groups.pop(request_id, None)
+
+def find_duplicate_request(customer_id: str, signature: np.ndarray) -> Optional[str]:
+    for request_id, _ in request_duplicates.query(signature, DUPLICATE_SIMILARITY_THRESHOLD):
+        owner, group = request_duplicate_groups[request_id]
+        if owner == customer_id:
+            return group
+    return None
+
+def collapse_duplicate_requests(requests: List[Request]) -> List[Request]:
+    # Hide a request when the request it duplicates is in the same listing
+    listed = {req.id for req in requests}
+    return [req for req in requests if req.duplicate_of not in listed]
+
+async def rebuild_duplicate_index():
+    started = time.perf_counter()
+    cursor = db.requests.find(
+        {"status": "open"},
+        {"_id": 0, "id": 1, "customer_id": 1, "title": 1, "description": 1, "duplicate_of": 1}
+    ).sort("created_at", 1)
+    batch = []
+    
+    async def flush():
+        signatures = await asyncio.to_thread(
+            lambda: [request_duplicates.signature(request_text(doc)) for doc in batch]
+        )
+        for doc, signature in zip(batch, signatures):
+            index_request_signature(doc, signature)
+        batch.clear()
+    
+    async for doc in cursor.batch_size(1000):
+        batch.append(doc)
+        if len(batch) >= 1000:
+            await flush()
+    await flush()
+    logger.info("Indexed %d open requests for duplicate detection in %.2fs",
+                len(request_duplicates), time.perf_counter() - started)
+
+# Open requests snapshot
+REGEX_METACHARACTERS = set(".^$*+?{}[]()|\\")
+
+class OpenRequestsSnapshot:
+    """Open requests in memory, indexed for the browse filters of GET /requests.
+
+    Every index is a list of (key, id) tuples kept sorted, so listings walk
+    the creation order newest first and budget bounds are bisect range scans.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self._records: Dict[str, Request] = {}
+        self._by_created: List[tuple] = []
+        self._by_category: Dict[str, List[tuple]] = defaultdict(list)
+        self._by_budget_min: List[tuple] = []
+        self._by_budget_max: List[tuple] = []
+        self._changes_during_load: Optional[list] = None
+
+    def __len__(self):
+        return len(self._records)
+
+    def _index_entries(self, request: Request):
+        yield self._by_created, (request.created_at, request.id)
+        for category in set(request.categories):
+            yield self._by_category[category], (request.created_at, request.id)
+        yield self._by_budget_min, (request.budget_min, request.id)
+        yield self._by_budget_max, (request.budget_max, request.id)
+
+    def upsert(self, request: Request):
+        if self._changes_during_load is not None:
+            self._changes_during_load.append((self.upsert, request))
+        self._remove(request.id)
+        if request.status != "open":
+            return
+        self._records[request.id] = request
+        for index, entry in self._index_entries(request):
+            bisect.insort(index, entry)
+
+    def remove(self, request_id: str):
+        if self._changes_during_load is not None:
+            self._changes_during_load.append((self.remove, request_id))
+        self._remove(request_id)
+
+    def _remove(self, request_id: str):
+        request = self._records.pop(request_id, None)
+        if request is None:
+            return
+        for index, entry in self._index_entries(request):
+            position = bisect.bisect_left(index, entry)
+            if position < len(index) and index[position] == entry:
+                del index[position]
+        for category in request.categories:
+            if not self._by_category.get(category):
+                self._by_category.pop(category, None)
+
+    def begin_load(self):
+        # Writes that land while a reload is in flight are replayed onto it
+        self._changes_during_load = []
+
+    def abort_load(self):
+        self._changes_during_load = None
+
+    def finish_load(self, requests: List[Request]):
+        changes, self._changes_during_load = self._changes_during_load or [], None
+        records = {request.id: request for request in requests}
+        by_category = defaultdict(list)
+        for request in records.values():
+            for category in set(request.categories):
+                by_category[category].append((request.created_at, request.id))
+        for index in by_category.values():
+            index.sort()
+        
+        self._records = records
+        self._by_category = by_category
+        self._by_created = sorted((request.created_at, request.id) for request in records.values())
+        self._by_budget_min = sorted((request.budget_min, request.id) for request in records.values())
+        self._by_budget_max = sorted((request.budget_max, request.id) for request in records.values())
+        for apply, argument in changes:
+            apply(argument)
+        self.ready = True
+
+    def query(
+        self,
+        category: Optional[str] = None,
+        min_budget: Optional[float] = None,
+        max_budget: Optional[float] = None,
+        location: Optional[str] = None,
+        limit: int = 100
+    ) -> Optional[List[Request]]:
+        """Newest open requests matching the filters, or None to defer to Mongo."""
+        # Locations are client-supplied regexes. Only plain text is matched
+        # here, as a case-insensitive substring; a pattern could backtrack for
+        # seconds on the event loop, so those are left to Mongo.
+        if location and any(char in REGEX_METACHARACTERS for char in location):
+            return None
+        needle = location.lower() if location else None
+        
+        def matches(request: Request) -> bool:
+            return ((min_budget is None or request.budget_max >= min_budget)
+                    and (max_budget is None or request.budget_min <= max_budget)
+                    and (needle is None or bool(request.location and needle in request.location.lower())))
+        
+        ordered = self._by_category.get(category, []) if category else self._by_created
+        
+        # Budget bounds are bisect ranges of the budget indexes. Walking the
+        # creation order until `limit` matches visits about limit * N / k
+        # entries for a range of k, so the narrowest range is scanned instead
+        # only when that is fewer
+        ranges = []
+        if min_budget is not None:
+            start = bisect.bisect_left(self._by_budget_max, min_budget, key=lambda entry: entry[0])
+            ranges.append((self._by_budget_max, start, len(self._by_budget_max)))
+        if max_budget is not None:
+            end = bisect.bisect_right(self._by_budget_min, max_budget, key=lambda entry: entry[0])
+            ranges.append((self._by_budget_min, 0, end))
+        if ranges:
+            index, start, end = min(ranges, key=lambda entry: entry[2] - entry[1])
+            if (end - start) ** 2 < limit * len(ordered):
+                in_range = (self._records[request_id] for _, request_id in index[start:end])
+                results = [request for request in in_range
+                           if matches(request) and (category is None or category in request.categories)]
+                results.sort(key=lambda request: (request.created_at, request.id), reverse=True)
+                return results[:limit]
+        
+        results = []
+        for _, request_id in reversed(ordered):
+            request = self._records[request_id]
+            if matches(request):
+                results.append(request)
+                if len(results) >= limit:
+                    break
+        return results
+
+open_requests = OpenRequestsSnapshot()
+# One reload at a time: a second begin_load would replace the change list of
+# the one in flight, losing writes it should replay
+open_requests_resync_lock = asyncio.Lock()
+# Set while an invalidation's full resync waits for the lock. Any resync that
+# starts loading after that covers it, so further ones are dropped meanwhile.
+open_requests_resync_requested = False
+
+async def resync_open_requests():
+    global open_requests_resync_requested
+    async with open_requests_resync_lock:
+        open_requests_resync_requested = False
+        started = time.perf_counter()
+        open_requests.begin_load()
+        try:
+            docs = await db.requests.find({"status": "open"}, {"_id": 0}).to_list(None)
+            requests = await asyncio.to_thread(lambda: [Request(**doc) for doc in docs])
+        except BaseException:
+            open_requests.abort_load()
+            raise
+        open_requests.finish_load(requests)
+        metrics["open_requests.size"] = len(open_requests)
+        metrics["open_requests.resync_seconds"] = time.perf_counter() - started
+
+async def refresh_open_requests(request_ids: Optional[List[str]]):
+    # Another worker changed these requests: re-read them into the snapshot
+    # and the duplicate index, which this worker only updates for its own writes
+    if request_ids is None:
+        if OPEN_REQUESTS_SNAPSHOT_ENABLED:
+            await resync_open_requests()
+        return
+    docs = await db.requests.find({"id": ids_filter(request_ids)},
+                                  {"_id": 0}).to_list(None)
+    found = {api_id(doc["id"]): doc for doc in docs}
+    for request_id in request_ids:
+        doc = found.get(request_id)
+        if doc is None or doc["status"] != "open":
+            open_requests.remove(request_id)
+            unindex_request_signature(request_id)
+            continue
+        if OPEN_REQUESTS_SNAPSHOT_ENABLED:
+            open_requests.upsert(Request(**doc))
+        if DUPLICATE_DETECTION_ENABLED and request_id not in request_duplicate_groups:
+            index_request_signature(doc, request_duplicates.signature(request_text(doc)))
+
+async def apply_remote_request_changes(request_ids: Optional[List[str]]):
+    try:
+        await refresh_open_requests(request_ids)
+    except Exception:
+        logger.exception("Refreshing changed open requests failed")
+
+# The loop only keeps weak references to tasks, so pending refreshes are held
+# here until they finish
+open_requests_refresh_tasks = set()
+
+def schedule_remote_request_changes(request_ids: Optional[List[str]]):
+    global open_requests_resync_requested
+    if request_ids is None:
+        if open_requests_resync_requested:
+            metrics["open_requests.resyncs_coalesced"] += 1
+            return
+        open_requests_resync_requested = True
+    task = asyncio.create_task(apply_remote_request_changes(request_ids))
+    open_requests_refresh_tasks.add(task)
+    task.add_done_callback(open_requests_refresh_tasks.discard)
+
+invalidation_bus.subscribe("requests", schedule_remote_request_changes, local=False)
+
+async def open_requests_resync_loop():
+    while True:
+        try:
+            await resync_open_requests()
+        except Exception:
+            logger.exception("Open requests resync failed")
+        await asyncio.sleep(OPEN_REQUESTS_RESYNC_SECONDS)
+
+# Category analytics
+async def load_market_columns():
+    # Stream requests and offers into flat columns. Requests are exploded to
+    # one (category, request row) pair per category; offers point at their
+    # request row.
+    category_codes: Dict[str, int] = {}
+    request_rows: Dict[str, int] = {}
+    budget_min, budget_max = [], []
+    pair_category, pair_row = [], []
+    cursor = replica_db.requests.find({}, {"_id": 0, "id": 1, "budget_min": 1, "budget_max": 1, "categories": 1})
+    async for doc in cursor.batch_size(ANALYTICS_BATCH_SIZE):
+        row = len(budget_min)
+        request_rows[api_id(doc["id"])] = row
+        budget_min.append(doc["budget_min"])
+        budget_max.append(doc["budget_max"])
+        for category in doc.get("categories") or []:
+            pair_category.append(category_codes.setdefault(category, len(category_codes)))
+            pair_row.append(row)
+    
+    offer_row, offer_price, offer_accepted = [], [], []
+    cursor = replica_db.offers.find({}, {"_id": 0, "request_id": 1, "price": 1, "status": 1})
+    async for doc in cursor.batch_size(ANALYTICS_BATCH_SIZE):
+        row = request_rows.get(api_id(doc["request_id"]))
+        if row is None:
+            continue
+        offer_row.append(row)
+        offer_price.append(doc["price"])
+        offer_accepted.append(doc.get("status") == "accepted")
+    
+    return (
+        list(category_codes),
+        np.array(budget_min, dtype=np.float64),
+        np.array(budget_max, dtype=np.float64),
+        np.array(pair_category, dtype=np.int64),
+        np.array(pair_row, dtype=np.int64),
+        np.array(offer_row, dtype=np.int64),
+        np.array(offer_price, dtype=np.float64),
+        np.array(offer_accepted, dtype=bool),
+    )
+
+def grouped_quantiles(codes: np.ndarray, values: np.ndarray, groups: int) -> np.ndarray:
+    # Linear-interpolated quantiles for every group at once; rows of empty
+    # groups are NaN
+    order = np.lexsort((values, codes))
+    sorted_values = values[order]
+    bounds = np.searchsorted(codes[order], np.arange(groups + 1))
+    starts, counts = bounds[:-1], np.diff(bounds)
+    positions = starts[:, None] + np.asarray(ANALYTICS_QUANTILES)[None, :] * np.maximum(counts - 1, 0)[:, None]
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.ceil(positions).astype(np.int64)
+    result = np.full(positions.shape, np.nan)
+    present = counts > 0
+    lo, hi = sorted_values[lower[present]], sorted_values[upper[present]]
+    result[present] = lo + (hi - lo) * (positions[present] - lower[present])
+    return result
+
+def compute_category_stats(names, budget_min, budget_max, pair_category, pair_row,
+                           offer_row, offer_price, offer_accepted) -> List[dict]:
+    groups = len(names)
+    budget_mid = (budget_min + budget_max) / 2
+    
+    # Explode offers to one row per category of their request
+    by_row = np.argsort(pair_row, kind="stable")
+    categories_by_row = pair_category[by_row]
+    per_row = np.bincount(pair_row, minlength=len(budget_min))
+    row_starts = np.cumsum(per_row) - per_row
+    repeats = per_row[offer_row]
+    offer_index = np.repeat(np.arange(len(offer_row)), repeats)
+    within = np.arange(repeats.sum()) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    offer_category = categories_by_row[np.repeat(row_starts[offer_row], repeats) + within]
+    
+    price = offer_price[offer_index]
+    mid = budget_mid[offer_row[offer_index]]
+    priced = mid > 0
+    
+    request_counts = np.bincount(pair_category, minlength=groups)
+    offer_counts = np.bincount(offer_category, minlength=groups)
+    accepted_counts = np.bincount(offer_category, weights=offer_accepted[offer_index], minlength=groups)
+    budget_q = grouped_quantiles(pair_category, budget_mid[pair_row], groups)
+    price_q = grouped_quantiles(offer_category, price, groups)
+    ratio_q = grouped_quantiles(offer_category[priced], price[priced] / mid[priced], groups)
+    
+    def quantiles(row):
+        return {f"p{round(q * 100)}": (None if np.isnan(v) else round(float(v), 4))
+                for q, v in zip(ANALYTICS_QUANTILES, row)}
+    
+    stats = []
+    for code, name in enumerate(names):
+        offers = int(offer_counts[code])
+        stats.append({
+            "category": name,
+            "requests": int(request_counts[code]),
+            "offers": offers,
+            "acceptance_rate": round(float(accepted_counts[code]) / offers, 4) if offers else None,
+            "budget": quantiles(budget_q[code]),
+            "offer_price": quantiles(price_q[code]),
+            "offer_to_budget_ratio": quantiles(ratio_q[code]),
+        })
+    stats.sort(key=lambda entry: entry["requests"], reverse=True)
+    return stats
+
+category_analytics: Optional[dict] = None
+category_analytics_lock = asyncio.Lock()
+
+async def refresh_category_analytics():
+    global category_analytics
+    started = time.perf_counter()
+    columns = await load_market_columns()
+    categories = await asyncio.to_thread(compute_category_stats, *columns)
+    category_analytics = {"computed_at": datetime.utcnow(), "categories": categories}
+    metrics["analytics.refresh_seconds"] = time.perf_counter() - started
+
+async def category_analytics_loop():
+    while True:
+        await asyncio.sleep(ANALYTICS_REFRESH_SECONDS)
+        try:
+            async with category_analytics_lock:
+                await refresh_category_analytics()
+        except Exception:
+            logger.exception("Category analytics refresh failed")
+
+@api_router.get("/analytics/categories")
+async def get_category_analytics(current_user: User = Depends(get_current_user)):
+    if category_analytics is None:
+        async with category_analytics_lock:
+            if category_analytics is None:
+                await refresh_category_analytics()
+    return category_analytics
+
+# Seller reputation. One document per seller in `seller_reputation`, keyed by
+# the seller's API id and updated as offers are made and accepted; the latest
+# samples are kept so medians can be taken without touching `offers`.
+def reputation_samples(offer: Offer, request_doc: dict) -> dict:
+    samples = {"response_seconds": max(0.0, (offer.created_at - request_doc["created_at"]).total_seconds())}
+    if request_doc.get("budget_max"):
+        samples["price_ratios"] = offer.price / request_doc["budget_max"]
+    return samples
+
+async def record_offer_made(offer: Offer, request_doc: dict):
+    samples = reputation_samples(offer, request_doc)
+    await db.seller_reputation.update_one(
+        {"_id": offer.seller_id},
+        {
+            "$inc": {"offers_made": 1},
+            "$push": {
+                field: {"$each": [value], "$slice": -REPUTATION_SAMPLE_SIZE}
+                for field, value in samples.items()
+            },
+            "$set": {"updated_at": datetime.utcnow()}
+        },
+        upsert=True
+    )
+
+async def record_offer_accepted(seller_id: str):
+    await db.seller_reputation.update_one(
+        {"_id": seller_id},
+        {"$inc": {"offers_accepted": 1}, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+
+def summarize_reputation(doc: dict) -> SellerReputation:
+    offers_made = doc.get("offers_made", 0)
+    offers_accepted = doc.get("offers_accepted", 0)
+    price_ratios = doc.get("price_ratios") or []
+    response_seconds = doc.get("response_seconds") or []
+    return SellerReputation(
+        offers_made=offers_made,
+        offers_accepted=offers_accepted,
+        accepted_ratio=offers_accepted / offers_made if offers_made else 0.0,
+        median_price_to_budget=float(np.median(price_ratios)) if price_ratios else None,
+        median_response_seconds=float(np.median(response_seconds)) if response_seconds else None
+    )
+
+async def load_seller_reputations(seller_ids: List[str]) -> Dict[str, SellerReputation]:
+    docs = await db.seller_reputation.find({"_id": {"$in": seller_ids}}).to_list(len(seller_ids))
+    return {doc["_id"]: summarize_reputation(doc) for doc in docs}
+
+async def recompute_seller_reputation() -> int:
+    """Rebuild every seller's reputation from `offers` and `requests`.
+    
+    Repairs drift in the incremental counters (a crash between inserting an
+    offer and counting it, for instance). Offers made or accepted while this
+    runs may be counted twice or not at all, so run it off-peak.
+    """
+    started = time.perf_counter()
+    reputations = defaultdict(lambda: {
+        "offers_made": 0,
+        "offers_accepted": 0,
+        "price_ratios": deque(maxlen=REPUTATION_SAMPLE_SIZE),
+        "response_seconds": deque(maxlen=REPUTATION_SAMPLE_SIZE)
+    })
+    
+    async def add_batch(batch):
+        request_ids = list({api_id(doc["request_id"]) for doc in batch})
+        request_docs = await db.requests.find(
+            {"id": ids_filter(request_ids)},
+            {"_id": 0, "id": 1, "budget_max": 1, "created_at": 1}
+        ).to_list(len(request_ids))
+        requests_by_id = {api_id(doc["id"]): doc for doc in request_docs}
+        for doc in batch:
+            reputation = reputations[api_id(doc["seller_id"])]
+            reputation["offers_made"] += 1
+            reputation["offers_accepted"] += doc.get("status") == "accepted"
+            request_doc = requests_by_id.get(api_id(doc["request_id"]))
+            if request_doc is not None:
+                for field, value in reputation_samples(Offer(**doc), request_doc).items():
+                    reputation[field].append(value)
+    
+    batch = []
+    cursor = db.offers.find({}, {"_id": 0}).sort("created_at", 1)
+    async for doc in cursor.batch_size(REPUTATION_RECOMPUTE_BATCH_SIZE):
+        batch.append(doc)
+        if len(batch) >= REPUTATION_RECOMPUTE_BATCH_SIZE:
+            await add_batch(batch)
+            batch = []
+    if batch:
+        await add_batch(batch)
+    
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne({"_id": seller_id}, {"$set": {
+            "offers_made": reputation["offers_made"],
+            "offers_accepted": reputation["offers_accepted"],
+            "price_ratios": list(reputation["price_ratios"]),
+            "response_seconds": list(reputation["response_seconds"]),
+            "updated_at": now
+        }}, upsert=True)
+        for seller_id, reputation in reputations.items()
+    ]
+    for start in range(0, len(operations), REPUTATION_RECOMPUTE_BATCH_SIZE):
+        await db.seller_reputation.bulk_write(operations[start:start + REPUTATION_RECOMPUTE_BATCH_SIZE], ordered=False)
+    logger.info("Recomputed reputation of %d sellers in %.2fs", len(reputations), time.perf_counter() - started)
+    return len(reputations)
+
+# Request view counters. Counts live in `request_stats`, one document per
+# request keyed by its API id.
+class CounterBuffer:
+    """Sums counter increments in memory and writes them as one bulk_write of
+    $inc upserts, so a hot read path costs a dict update instead of a write."""
+
+    def __init__(self, name: str, max_keys: int, max_unflushed: int):
+        self.name = name
+        self.max_keys = max_keys
+        self.max_unflushed = max_unflushed
+        self._pending: Dict[str, Dict[str, int]] = {}
+        self._unflushed = 0
+        self._flush_lock = asyncio.Lock()
+        self._early_flush: Optional[asyncio.Task] = None
+
+    def add(self, key: str, field: str, amount: int = 1):
+        counts = self._pending.get(key)
+        if counts is None:
+            if len(self._pending) >= self.max_keys:
+                metrics[f"counters.{self.name}.dropped"] += amount
+                return
+            counts = self._pending[key] = defaultdict(int)
+        counts[field] += amount
+        self._unflushed += amount
+        if self._unflushed >= self.max_unflushed and (self._early_flush is None or self._early_flush.done()):
+            self._early_flush = asyncio.create_task(self.flush())
+
+    def _restore(self, batch: Dict[str, Dict[str, int]]):
+        # Put back increments that failed to write, ahead of newer ones
+        for key, counts in batch.items():
+            for field, amount in counts.items():
+                self.add(key, field, amount)
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending, self._unflushed = self._pending, {}, 0
+            operations = [
+                UpdateOne({"_id": key}, {"$inc": dict(counts), "$currentDate": {"updated_at": True}}, upsert=True)
+                for key, counts in batch.items()
+            ]
+            started = time.perf_counter()
+            try:
+                await db[self.name].bulk_write(operations, ordered=False)
+            except Exception:
+                metrics[f"counters.{self.name}.flush_errors"] += 1
+                logger.exception("Flushing %d %s counters failed", len(operations), self.name)
+                self._restore(batch)
+                return
+            metrics[f"counters.{self.name}.flushes"] += 1
+            metrics[f"counters.{self.name}.flushed_keys"] += len(operations)
+            metrics[f"counters.{self.name}.last_flush_seconds"] = time.perf_counter() - started
+
+request_counters = CounterBuffer("request_stats", COUNTER_MAX_KEYS, COUNTER_MAX_UNFLUSHED)
+
+def count_impressions(requests: List[Request], viewer: User):
+    if viewer.user_type == "seller":
+        for request in requests:
+            request_counters.add(request.id, "impressions")
+
+async def counter_flush_loop():
+    while True:
+        await asyncio.sleep(COUNTER_FLUSH_SECONDS)
+        await request_counters.flush()
+
+@api_router.get("/requests/{request_id}/stats", response_model=RequestStats)
+async def get_request_stats(request_id: str, current_user: User = Depends(get_current_user)):
+    request_doc = await db.requests.find_one({"id": id_filter(request_id)}, {"_id": 0, "customer_id": 1})
+    if not request_doc:
+        raise HTTPException(status_code=404, detail="Request not found")
+    if api_id(request_doc["customer_id"]) != current_user.id:
+        raise HTTPException(status_code=403, detail="Only the request owner can view its stats")
+    
+    # Increments still buffered on any worker are not included
+    stats = await db.request_stats.find_one({"_id": request_id})
+    return RequestStats(**(stats or {}))
+
+@api_router.get("/admin/hot-requests", dependencies=[Depends(require_admin)])
+async def get_hot_requests(by: str = "views", limit: int = 20):
+    if by not in RequestStats.model_fields:
+        raise HTTPException(status_code=400, detail=f"by must be one of {', '.join(RequestStats.model_fields)}")
+    stats = await db.request_stats.find({}).sort(by, -1).to_list(min(limit, 100))
+    request_docs = await db.requests.find(
+        {"id": ids_filter(doc["_id"] for doc in stats)},
+        {"_id": 0, "id": 1, "title": 1, "status": 1}
+    ).to_list(len(stats))
+    requests_by_id = {api_id(doc["id"]): doc for doc in request_docs}
     return [
-        "Apparel & Fashion",
-        "Electronics & Gadgets", 
-        "Home & Garden",
-        "Automotive",
-        "Services",
-        "Books & Media",
-        "Custom Items",
-        "Food & Beverages",
-        "Health & Beauty",
-        "Sports & Recreation"
+        {
+            "request_id": doc["_id"],
+            "title": requests_by_id.get(doc["_id"], {}).get("title"),
+            "status": requests_by_id.get(doc["_id"], {}).get("status"),
+            **RequestStats(**doc).dict()
+        }
+        for doc in stats
     ]
 
+# Delta sync. Every insert or update of a request or offer appends an entry
+# to `change_log` naming the entity and the users whose views show it: the
+# request's customer, the offer's seller and customer, and for requests
+# everyone browsing open requests. Entries are stamped with the database
+# server's clock, and a cursor is the (time, _id) of the last entry a client
+# has seen.
+SYNCED_COLLECTIONS = ("requests", "offers")
+OPEN_REQUESTS_AUDIENCE = "open_requests"
+EPOCH = datetime(1970, 1, 1)
+MIN_OBJECT_ID = ObjectId("0" * 24)
+MAX_OBJECT_ID = ObjectId("f" * 24)
+
+async def change_audiences(entity: str, docs: List[dict]) -> List[List[str]]:
+    if entity == "requests":
+        return [[api_id(doc["customer_id"]), OPEN_REQUESTS_AUDIENCE] for doc in docs]
+    request_ids = list({doc["request_id"] for doc in docs})
+    request_docs = await db.requests.find(
+        {"id": ids_filter(request_ids)},
+        {"_id": 0, "id": 1, "customer_id": 1}
+    ).to_list(None)
+    owners = {api_id(doc["id"]): api_id(doc["customer_id"]) for doc in request_docs}
+    return [
+        [api_id(doc["seller_id"])] + ([owners[api_id(doc["request_id"])]] if api_id(doc["request_id"]) in owners else [])
+        for doc in docs
+    ]
+
+async def log_changes(entity: str, docs: List[dict]):
+    if not docs:
+        return
+    audiences = await change_audiences(entity, docs)
+    await db.change_log.bulk_write([
+        UpdateOne(
+            {"_id": ObjectId()},
+            {
+                "$setOnInsert": {"entity": entity, "entity_id": api_id(doc["id"]), "audience": audience},
+                "$currentDate": {"at": True}
+            },
+            upsert=True
+        )
+        for doc, audience in zip(docs, audiences)
+    ], ordered=False)
+
+async def database_time() -> datetime:
+    return (await db.command("hello"))["localTime"]
+
+def encode_sync_cursor(at: datetime, change_id: ObjectId) -> str:
+    return f"{(at - EPOCH) // timedelta(milliseconds=1)}.{change_id}"
+
+def decode_sync_cursor(cursor: str) -> tuple:
+    try:
+        millis, change_id = cursor.split(".")
+        return EPOCH + timedelta(milliseconds=int(millis)), ObjectId(change_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid sync cursor")
+
+async def current_sync_cursor() -> str:
+    # Everything up to the settle horizon; take it before loading full lists
+    # so that changes made while they load are synced afterwards
+    horizon = await database_time() - timedelta(milliseconds=SYNC_SETTLE_MS)
+    return encode_sync_cursor(horizon, MAX_OBJECT_ID)
+
+async def load_synced_entities(collection, ids: List[str]) -> List[dict]:
+    if not ids:
+        return []
+    return await collection.find(
+        {"id": ids_filter(ids)},
+        {"_id": 0}
+    ).to_list(None)
+
+@api_router.get("/sync")
+async def sync_changes(since: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    """Requests and offers in the user's views that changed after `since`.
+    
+    Returns the current version of each changed request and offer, the ids of
+    requests that left the open listing, and the cursor to send next time.
+    With `reset` set the cursor is too old (or missing) and the client must
+    reload its lists in full, after taking the returned cursor.
+    """
+    now = await database_time()
+    horizon = now - timedelta(milliseconds=SYNC_SETTLE_MS)
+    response = {"reset": False, "has_more": False, "requests": [], "offers": [], "closed_requests": []}
+    since_at, since_id = decode_sync_cursor(since) if since else (None, None)
+    if since_at is None or since_at < now - timedelta(days=SYNC_LOG_RETENTION_DAYS):
+        return {**response, "reset": True, "cursor": encode_sync_cursor(horizon, MAX_OBJECT_ID)}
+    
+    changes = await db.change_log.find({
+        "audience": {"$in": [current_user.id, OPEN_REQUESTS_AUDIENCE]},
+        "at": {"$lte": horizon},
+        "$or": [{"at": {"$gt": since_at}}, {"at": since_at, "_id": {"$gt": since_id}}]
+    }).sort([("at", 1), ("_id", 1)]).limit(SYNC_PAGE_SIZE).to_list(SYNC_PAGE_SIZE)
+    
+    # A full page may stop mid-stream; otherwise everything up to the horizon
+    # has been seen
+    has_more = len(changes) == SYNC_PAGE_SIZE
+    if has_more:
+        cursor = encode_sync_cursor(changes[-1]["at"], changes[-1]["_id"])
+    else:
+        cursor = encode_sync_cursor(max(horizon, since_at), MAX_OBJECT_ID)
+    
+    changed = defaultdict(dict)
+    for change in changes:
+        changed[change["entity"]][change["entity_id"]] = True
+    request_docs, offer_docs = await asyncio.gather(
+        load_synced_entities(db.requests, list(changed["requests"])),
+        load_synced_entities(db.offers, list(changed["offers"]))
+    )
+    
+    for doc in request_docs:
+        request = Request(**doc)
+        if request.status == "open" or request.customer_id == current_user.id:
+            response["requests"].append(request)
+        else:
+            response["closed_requests"].append(request.id)
+    response["offers"] = [Offer(**doc) for doc in offer_docs]
+    return {**response, "has_more": has_more, "cursor": cursor}
+
 # Include the router in the main app
 app.include_router(api_router)
 
+# Request context
+class RequestContextMiddleware:
+    # Exposes the ASGI scope to code running on behalf of the request,
+    # including Mongo command listeners
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = causal_token = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+            elif name == b"x-causal-token":
+                causal_token = value.decode("latin-1")
+        context = {"request_id": request_id or new_id(), "user_id": None, "started": time.perf_counter(),
+                   "causal_token_received": causal_token}
+        status = None
+        
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []),
+                                      (b"x-request-id", context["request_id"].encode("latin-1"))]
+                # Set by user_session after a write
+                if context.get("causal_token"):
+                    message["headers"].append((b"x-causal-token", context["causal_token"].encode("latin-1")))
+            await send(message)
+        
+        token = request_scope.set(scope)
+        context_token = log_context.set(context)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            access_logger.info("%s %s %s", scope["method"], scope["path"], status)
+            log_context.reset(context_token)
+            request_scope.reset(token)
+
+def current_route() -> Optional[str]:
+    scope = request_scope.get()
+    if scope is None:
+        return None
+    route = scope.get("route")
+    return f"{scope['method']} {getattr(route, 'path', scope['path'])}"
+
+# Slow-query log
+EXPLAIN_SKIPPED_FIELDS = {
+    "lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "readConcern",
+    "startTransaction", "autocommit", "apiVersion", "apiStrict", "apiDeprecationErrors"
+}
+
+def query_shape(value):
+    # Keep field names and operators, drop the values
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        if value and all(isinstance(item, dict) for item in value):
+            return [query_shape(item) for item in value]
+        return ["?"]
+    return "?"
+
+def command_shape(command: dict) -> dict:
+    name = next(iter(command))
+    shape = {name: command[name]}
+    for field in ("filter", "query", "sort", "pipeline", "key"):
+        if field in command:
+            shape[field] = command[field] if field in ("sort", "key") else query_shape(command[field])
+    return shape
+
+def summarize_plan(plan) -> str:
+    # "FETCH <- IXSCAN status_1_created_at_-1" style chain of the winning plan
+    stages = []
+    while isinstance(plan, dict):
+        if "queryPlan" in plan:
+            plan = plan["queryPlan"]
+        stage = plan.get("stage")
+        if stage:
+            stages.append(f"{stage} {plan['indexName']}" if plan.get("indexName") else stage)
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return " <- ".join(stages)
+
+def explain_execution(explain: dict):
+    if "stages" in explain:
+        explain = explain["stages"][0].get("$cursor", explain)
+    stats = explain.get("executionStats", {})
+    plan = explain.get("queryPlanner", {}).get("winningPlan")
+    return stats, summarize_plan(plan)
+
+class SlowQueryMonitor:
+    """Explains slow or inefficient reads and logs them once per query shape.
+
+    Listener callbacks run on Motor's executor threads and only do dictionary
+    bookkeeping; explains and log writes are scheduled onto the event loop.
+    Every shape is explained on first sight in each dedup window, which is how
+    fast queries that scan far more documents than they return are caught.
+    """
+
+    EXPLAINABLE = {"find", "aggregate", "count", "distinct"}
+
+    def __init__(self):
+        self.loop = None
+        self._pending: Dict[tuple, tuple] = {}
+        self._checked = LRUCache(10000)
+        self._recorded = LRUCache(10000)
+        self._lock = threading.Lock()
+        self._tasks = set()
+
+    def command_started(self, event):
+        if self.loop is None or event.command_name not in self.EXPLAINABLE:
+            return
+        if event.command.get(event.command_name) == "slow_queries":
+            return
+        self._pending[(event.connection_id, event.request_id)] = (
+            dict(event.command), event.database_name, current_route()
+        )
+
+    def command_failed(self, event):
+        self._pending.pop((event.connection_id, event.request_id), None)
+
+    def command_succeeded(self, event):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        command, database, route = pending
+        duration_ms = event.duration_micros / 1000
+        shape = command_shape(command)
+        shape_key = hashlib.sha1(json.dumps(shape, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        
+        now = time.monotonic()
+        with self._lock:
+            if self._recent(self._recorded, shape_key, now):
+                return
+            if duration_ms < SLOW_QUERY_MS and self._recent(self._checked, shape_key, now):
+                return
+            self._checked.set(shape_key, now)
+        self.loop.call_soon_threadsafe(self._schedule, command, database, route, duration_ms, shape, shape_key)
+
+    @staticmethod
+    def _recent(seen: LRUCache, shape_key: str, now: float) -> bool:
+        last = seen.get(shape_key)
+        return last is not None and now - last < SLOW_QUERY_DEDUP_SECONDS
+
+    def _schedule(self, *args):
+        task = asyncio.ensure_future(self.capture(*args))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def capture(self, command, database, route, duration_ms, shape, shape_key):
+        try:
+            explain_command = {key: value for key, value in command.items() if key not in EXPLAIN_SKIPPED_FIELDS}
+            explain = await client[database].command({"explain": explain_command, "verbosity": "executionStats"})
+        except Exception:
+            metrics["slow_queries.explain_errors"] += 1
+            logger.exception("Explain failed for query shape %s", shape_key)
+            return
+        
+        stats, plan = explain_execution(explain)
+        examined = stats.get("totalDocsExamined", 0)
+        returned = stats.get("nReturned", 0)
+        inefficient = examined > SLOW_QUERY_EXAMINED_RATIO * max(returned, 1)
+        if duration_ms < SLOW_QUERY_MS and not inefficient:
+            return
+        
+        with self._lock:
+            self._recorded.set(shape_key, time.monotonic())
+        metrics["slow_queries.recorded"] += 1
+        name = next(iter(command))
+        await db.slow_queries.insert_one({
+            "shape_key": shape_key,
+            "shape": json.dumps(shape, sort_keys=True, default=str),
+            "command": name,
+            "collection": command[name],
+            "route": route,
+            "duration_ms": round(duration_ms, 3),
+            "docs_examined": examined,
+            "keys_examined": stats.get("totalKeysExamined", 0),
+            "returned": returned,
+            "plan": plan,
+            "reason": "slow" if duration_ms >= SLOW_QUERY_MS else "examined",
+            "recorded_at": datetime.utcnow()
+        })
+
+slow_query_monitor = SlowQueryMonitor()
+
+async def start_slow_query_log():
+    try:
+        await db.create_collection("slow_queries", capped=True, size=SLOW_QUERY_LOG_BYTES)
+    except CollectionInvalid:
+        pass  # already created, possibly by another worker
+    slow_query_monitor.loop = asyncio.get_running_loop()
+
+# Request profiling
+class RequestProfile:
+    """Stack samples and Mongo commands collected for one profiled request."""
+
+    def __init__(self, method: str, path: str):
+        self.id = new_id()
+        self.method = method
+        self.path = path
+        self.started_at = datetime.utcnow()
+        self.started = time.perf_counter()
+        self.status = None
+        self.duration_ms = None
+        self.stacks: Dict[str, int] = defaultdict(int)
+        self.commands: List[dict] = []
+        self._pending_commands: Dict[int, tuple] = {}
+
+    def command_started(self, event):
+        collection = event.command.get(event.command_name)
+        self._pending_commands[event.request_id] = (
+            time.perf_counter(), event.command_name, collection if isinstance(collection, str) else None
+        )
+
+    def command_finished(self, event, ok: bool):
+        pending = self._pending_commands.pop(event.request_id, None)
+        if pending is None:
+            return
+        started, command_name, collection = pending
+        self.commands.append({
+            "command": command_name,
+            "collection": collection,
+            "start_ms": round((started - self.started) * 1000, 3),
+            "duration_ms": round(event.duration_micros / 1000, 3),
+            "ok": ok,
+            "server": "%s:%s" % event.connection_id,
+        })
+
+class StackSampler:
+    """Samples the event loop thread while a profiled request is in flight.
+
+    Only stacks that pass through `marker` (the profiling middleware's frame)
+    belong to the profiled request; any other sample means the request was
+    awaiting I/O or another task held the loop.
+    """
+
+    def __init__(self, profile: RequestProfile, marker, interval: float):
+        self.profile = profile
+        self.marker = marker
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame is not self.marker:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if frame is None:
+                stack = ["[not running]"]
+            self.profile.stacks[";".join(reversed(stack))] += 1
+
+def write_profile(profile: RequestProfile):
+    # Collapsed stacks (flamegraph.pl / speedscope input) plus a JSON summary
+    # with the Mongo command timeline, keeping only the newest profiles
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    route = profile.path.strip("/").replace("/", "_") or "root"
+    stem = f"{profile.started_at:%Y%m%dT%H%M%S%f}-{profile.method}-{route}-{profile.id}"
+    root = f"{profile.method} {profile.path}"
+    with open(PROFILE_DIR / f"{stem}.folded", "w") as folded:
+        for stack, count in profile.stacks.items():
+            folded.write(f"{root};{stack} {count}\n" if stack else f"{root} {count}\n")
+    with open(PROFILE_DIR / f"{stem}.json", "w") as summary:
+        json.dump({
+            "id": profile.id,
+            "method": profile.method,
+            "path": profile.path,
+            "status": profile.status,
+            "started_at": profile.started_at.isoformat(),
+            "duration_ms": profile.duration_ms,
+            "samples": sum(profile.stacks.values()),
+            "interval_ms": PROFILE_INTERVAL_SECONDS * 1000,
+            "mongo_commands": profile.commands,
+        }, summary, indent=2)
+    for old in sorted(PROFILE_DIR.glob("*.json"))[:-PROFILE_RING_SIZE]:
+        old.unlink(missing_ok=True)
+        old.with_suffix(".folded").unlink(missing_ok=True)
+
+class ProfilingMiddleware:
+    # Pure ASGI so the endpoint runs in this middleware's task and its frames
+    # sit above ours on the sampled stack
+    def __init__(self, app):
+        self.app = app
+        self.requests_seen = 0
+
+    def should_profile(self, scope) -> bool:
+        if ADMIN_TOKEN:
+            for name, value in scope["headers"]:
+                if name == b"x-profile":
+                    return hmac.compare_digest(value, ADMIN_TOKEN.encode('utf-8'))
+        if PROFILE_SAMPLE_EVERY:
+            self.requests_seen += 1
+            return self.requests_seen % PROFILE_SAMPLE_EVERY == 0
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        
+        profile = RequestProfile(scope["method"], scope["path"])
+        
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile.id.encode('utf-8'))]
+            await send(message)
+        
+        token = active_profile.set(profile)
+        sampler = StackSampler(profile, sys._getframe(), PROFILE_INTERVAL_SECONDS)
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            sampler.stop()
+            active_profile.reset(token)
+            profile.duration_ms = round((time.perf_counter() - profile.started) * 1000, 3)
+            metrics["profiling.profiles"] += 1
+            asyncio.get_running_loop().run_in_executor(None, write_profile, profile)
+
+# Response compression
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript")
+
+def accepted_encodings(header: str) -> Dict[str, float]:
+    encodings = {}
+    for part in header.split(","):
+        name, *params = part.split(";")
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name.strip():
+            encodings[name.strip().lower()] = quality
+    return encodings
+
+def negotiate_encoding(header: str) -> Optional[str]:
+    accepted = accepted_encodings(header)
+    default = accepted.get("*", 0.0)
+    # brotli first so it wins ties
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best = max(candidates, key=lambda encoding: accepted.get(encoding, default))
+    return best if accepted.get(best, default) > 0 else None
+
+class StreamCompressor:
+    """Compresses a response body that may arrive in several chunks.
+
+    Each chunk is flushed so a streamed response reaches the client as it is
+    produced; a body sent in one message is finished in one call.
+    """
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        self.cpu_seconds = 0.0
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        started = time.thread_time()
+        if self.encoding == "br":
+            out = self._compressor.process(data) + (self._compressor.finish() if final else self._compressor.flush())
+        else:
+            out = self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+        self.cpu_seconds += time.thread_time() - started
+        return out
+
+    async def compress_chunk(self, data: bytes, final: bool) -> bytes:
+        if len(data) >= COMPRESSION_OFFLOAD_BYTES:
+            return await asyncio.get_running_loop().run_in_executor(None, self.compress, data, final)
+        return self.compress(data, final)
+
+def should_compress(status: int, headers: MutableHeaders, size: Optional[int]) -> bool:
+    if status < 200 or status in (204, 304) or "content-encoding" in headers:
+        return False
+    if not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+        return False
+    # Streams of unknown length are always compressed
+    return size is None or size >= COMPRESSION_MIN_BYTES
+
+class CompressionMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        encoding = None
+        if scope["type"] == "http":
+            for name, value in scope["headers"]:
+                if name == b"accept-encoding":
+                    encoding = negotiate_encoding(value.decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        
+        pending_start = None
+        compressor = None
+        
+        async def send_compressed(message):
+            nonlocal pending_start, compressor
+            if message["type"] == "http.response.start":
+                pending_start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if pending_start is not None:
+                # The first body message decides: a single message gives the
+                # whole size, a stream only its declared Content-Length
+                start, pending_start = pending_start, None
+                headers = MutableHeaders(scope=start)
+                size = len(body) if not more_body else (
+                    int(headers["content-length"]) if "content-length" in headers else None
+                )
+                if not should_compress(start["status"], headers, size):
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = StreamCompressor(encoding)
+                metrics[f"compression.{encoding}.responses"] += 1
+                del headers["content-length"]
+                headers["content-encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                data = await compressor.compress_chunk(body, not more_body)
+                if not more_body:
+                    headers["content-length"] = str(len(data))
+                await send(start)
+            elif compressor is None:
+                await send(message)
+                return
+            else:
+                data = await compressor.compress_chunk(body, not more_body)
+            
+            metrics[f"compression.{encoding}.bytes_in"] += len(body)
+            metrics[f"compression.{encoding}.bytes_out"] += len(data)
+            if not more_body:
+                metrics[f"compression.{encoding}.cpu_seconds"] += compressor.cpu_seconds
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+        
+        await self.app(scope, receive, send_compressed)
+
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(RequestContextMiddleware)
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Causal-Token"],
 )
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+class LogSampler(logging.Filter):
+    """Keeps a `rate` share of records at INFO and below."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.INFO or self.rate >= 1 or random.random() < self.rate:
+            return True
+        metrics["logging.sampled_out"] += 1
+        return False
+
+class LogContextFilter(logging.Filter):
+    # Runs in the emitting thread, where the request's context vars are set
+    def filter(self, record):
+        context = log_context.get()
+        if context is not None:
+            record.request_id = context["request_id"]
+            record.user_id = context["user_id"]
+            record.route = current_route()
+            record.latency_ms = round((time.perf_counter() - context["started"]) * 1000, 3)
+        return True
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Merge the arguments now, while they hold the values being logged;
+        # formatting, tracebacks included, is left to the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics["logging.dropped"] += 1
+
+class JsonLogFormatter(logging.Formatter):
+    CONTEXT_FIELDS = ("request_id", "user_id", "route", "latency_ms")
+
+    def format(self, record):
+        entry = {
+            "time": datetime.utcfromtimestamp(record.created).isoformat(timespec="milliseconds") + "Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in self.CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.levelno <= logging.INFO and LOG_INFO_SAMPLE_RATE < 1:
+            entry["sample_rate"] = LOG_INFO_SAMPLE_RATE
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+def configure_logging() -> logging.handlers.QueueListener:
+    output = logging.StreamHandler()
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonLogFormatter())
+    else:
+        output.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(LogSampler(LOG_INFO_SAMPLE_RATE))
+    handler.addFilter(LogContextFilter())
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+    # uvicorn installs its own stream handlers with propagate=False before it
+    # imports the app; send its records through the queue instead. Its access
+    # log repeats the one written by the request middleware, so it is only
+    # kept for warnings (run with --no-access-log to skip it entirely).
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+    logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
+    
+    listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    listener.start()
+    # Stopping drains whatever is still queued
+    atexit.register(listener.stop)
+    return listener
+
+log_listener = configure_logging()
 logger = logging.getLogger(__name__)
+access_logger = logging.getLogger(f"{__name__}.access")
+
+background_tasks: List[asyncio.Task] = []
+
+@app.on_event("startup")
+async def ensure_indexes():
+    await db.message_buckets.create_index([("conversation_key", 1), ("last_at", -1)])
+    await db.message_buckets.create_index("request_id")
+    await db.users.create_index([("subscription_status", 1), ("trial_expires_at", 1)])
+    await db.requests.create_index([("status", 1), ("created_at", -1)])
+    await db.requests.create_index([("status", 1), ("categories", 1), ("budget_max", 1)])
+    await db.offers.create_index([("status", 1), ("created_at", 1)])
+    await db.idempotency_keys.create_index("created_at", expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS)
+    await db.change_log.create_index([("audience", 1), ("at", 1), ("_id", 1)])
+    await db.change_log.create_index("at", expireAfterSeconds=SYNC_LOG_RETENTION_DAYS * 86400)
+    await db.request_stats.create_index([("views", -1)])
+    await db.request_stats.create_index([("impressions", -1)])
+
+@app.on_event("startup")
+async def start_background_tasks():
+    if LIFECYCLE_SWEEP_ENABLED:
+        background_tasks.append(asyncio.create_task(lifecycle_sweeper_loop()))
+    background_tasks.append(asyncio.create_task(category_analytics_loop()))
+    if DUPLICATE_DETECTION_ENABLED:
+        background_tasks.append(asyncio.create_task(rebuild_duplicate_index()))
+    if SLOW_QUERY_LOG_ENABLED:
+        await start_slow_query_log()
+    if OPEN_REQUESTS_SNAPSHOT_ENABLED:
+        background_tasks.append(asyncio.create_task(open_requests_resync_loop()))
+    if CACHE_BUS_ENABLED and STORAGE_BACKEND != "memory":
+        background_tasks.append(asyncio.create_task(invalidation_bus.run()))
+    background_tasks.append(asyncio.create_task(counter_flush_loop()))
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    tasks = background_tasks + list(open_requests_refresh_tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    background_tasks.clear()
+    # Buffered counters go out before the client closes
+    await request_counters.flush()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
@@ -325,6 +325,11 @@ class ReverseMarketplaceAPITest(unittest.TestCase):
         if self.offer_id:
             offer_ids = [offer["id"] for offer in offers_data]
             self.assertIn(self.offer_id, offer_ids, "Created offer not found in offers for request")
+
+            # Offers carry the seller's name and reputation
+            offer = offers_data[offer_ids.index(self.offer_id)]
+            self.assertTrue(offer["seller_name"], "Offer should include the seller name")
+            self.assertGreaterEqual(offer["seller_reputation"]["offers_made"], 1)
         
         print("✅ Get offers for request successful")
 
@@ -404,6 +409,108 @@ class ReverseMarketplaceAPITest(unittest.TestCase):
         
         print("✅ Dashboard stats successful")
 
+    def test_17_idempotent_request_creation(self):
+        """Test that a repeated Idempotency-Key replays the original request"""
+        print("\n🔍 Testing idempotent request creation...")
+        
+        if not self.customer_token:
+            self.skipTest("Customer token not available")
+        
+        headers = {
+            "Authorization": f"Bearer {self.customer_token}",
+            "Idempotency-Key": str(uuid.uuid4())
+        }
+        payload = {
+            "title": "Idempotent Request",
+            "description": "This request is posted twice with the same key",
+            "budget_min": 500,
+            "budget_max": 800,
+            "categories": ["Services"]
+        }
+        
+        first = requests.post(f"{API_URL}/requests", json=payload, headers=headers)
+        second = requests.post(f"{API_URL}/requests", json=payload, headers=headers)
+        
+        self.assertEqual(first.status_code, 200, f"Failed to create request: {first.text}")
+        self.assertEqual(second.status_code, 200, f"Failed to replay request: {second.text}")
+        self.assertEqual(first.json()["id"], second.json()["id"], "Retry created a second request")
+        
+        # Reusing the key for a different body is rejected
+        payload["title"] = "Different Request"
+        response = requests.post(f"{API_URL}/requests", json=payload, headers=headers)
+        self.assertEqual(response.status_code, 422, "Reused Idempotency-Key should be rejected")
+        
+        print("✅ Idempotent request creation successful")
+
+    def test_18_dashboard_bootstrap(self):
+        """Test the combined dashboard bootstrap payload"""
+        print("\n🔍 Testing dashboard bootstrap...")
+        
+        if self.customer_token:
+            headers = {"Authorization": f"Bearer {self.customer_token}"}
+            response = requests.get(f"{API_URL}/dashboard/bootstrap", headers=headers)
+            
+            self.assertEqual(response.status_code, 200, f"Failed to get customer bootstrap: {response.text}")
+            data = response.json()
+            for key in ("user", "categories", "stats", "my_requests", "timings_ms"):
+                self.assertIn(key, data, f"No {key} in customer bootstrap")
+            self.assertIn("total_requests", data["stats"], "No total_requests in customer stats")
+        
+        if self.seller_token:
+            headers = {"Authorization": f"Bearer {self.seller_token}"}
+            response = requests.get(f"{API_URL}/dashboard/bootstrap", headers=headers)
+            
+            self.assertEqual(response.status_code, 200, f"Failed to get seller bootstrap: {response.text}")
+            data = response.json()
+            for key in ("user", "categories", "stats", "requests", "my_offers", "timings_ms"):
+                self.assertIn(key, data, f"No {key} in seller bootstrap")
+            self.assertIn("total_offers", data["stats"], "No total_offers in seller stats")
+        
+        print("✅ Dashboard bootstrap successful")
+
+    def test_19_request_facets(self):
+        """Test category, budget and location counts for the browse filters"""
+        print("\n🔍 Testing request facets...")
+        
+        if not self.seller_token:
+            self.skipTest("Seller token not available")
+        
+        headers = {"Authorization": f"Bearer {self.seller_token}"}
+        response = requests.get(f"{API_URL}/requests/facets", headers=headers)
+        
+        self.assertEqual(response.status_code, 200, f"Failed to get request facets: {response.text}")
+        data = response.json()
+        for key in ("total", "categories", "budget", "locations"):
+            self.assertIn(key, data, f"No {key} in request facets")
+        self.assertEqual(sum(bucket["count"] for bucket in data["budget"]), data["total"],
+                         "Budget buckets should add up to the total")
+        
+        print("✅ Request facets successful")
+
+    def test_20_delta_sync(self):
+        """Test that a bootstrap cursor can be exchanged for changes since it"""
+        print("\n🔍 Testing delta sync...")
+        
+        if not self.customer_token:
+            self.skipTest("Customer token not available")
+        
+        headers = {"Authorization": f"Bearer {self.customer_token}"}
+        response = requests.get(f"{API_URL}/dashboard/bootstrap", headers=headers)
+        self.assertEqual(response.status_code, 200, f"Failed to get dashboard bootstrap: {response.text}")
+        cursor = response.json()["sync_cursor"]
+        
+        response = requests.get(f"{API_URL}/sync", params={"since": cursor}, headers=headers)
+        self.assertEqual(response.status_code, 200, f"Failed to sync: {response.text}")
+        data = response.json()
+        for key in ("reset", "has_more", "requests", "offers", "closed_requests", "cursor"):
+            self.assertIn(key, data, f"No {key} in sync response")
+        self.assertFalse(data["reset"], "A fresh cursor should not need a reset")
+        
+        response = requests.get(f"{API_URL}/sync", params={"since": "not-a-cursor"}, headers=headers)
+        self.assertEqual(response.status_code, 400, "Malformed cursors should be rejected")
+        
+        print("✅ Delta sync successful")
+
 if __name__ == "__main__":
     # Create a test suite
     test_suite = unittest.TestSuite()
@@ -425,6 +532,10 @@ if __name__ == "__main__":
     test_suite.addTest(ReverseMarketplaceAPITest('test_14_get_my_offers'))
     test_suite.addTest(ReverseMarketplaceAPITest('test_15_accept_offer'))
     test_suite.addTest(ReverseMarketplaceAPITest('test_16_dashboard_stats'))
+    test_suite.addTest(ReverseMarketplaceAPITest('test_17_idempotent_request_creation'))
+    test_suite.addTest(ReverseMarketplaceAPITest('test_18_dashboard_bootstrap'))
+    test_suite.addTest(ReverseMarketplaceAPITest('test_19_request_facets'))
+    test_suite.addTest(ReverseMarketplaceAPITest('test_20_delta_sync'))
     
     # Run the tests
     runner = unittest.TextTestRunner(verbosity=2)
@@ -6,7 +6,7 @@ cd /backend || { echo "Backend directory not found"; exit 1; }
 
 echo "Starting FastAPI backend"
 # Start Uvicorn with proper host binding
-uvicorn server:app --host 0.0.0.0 --port 8001 &
+uvicorn server:app --host 0.0.0.0 --port 8001 --no-access-log &
 BACKEND_PID=$!
 
 echo "Waiting for backend to start..."
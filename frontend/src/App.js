@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
 import './App.css';
 
@@ -12,6 +12,11 @@ axios.interceptors.request.use(
     if (token) {
       config.headers.Authorization = `Bearer ${token}`;
     }
+    // Lets whichever backend worker serves the read see our latest write
+    const causalToken = localStorage.getItem('causalToken');
+    if (causalToken) {
+      config.headers['X-Causal-Token'] = causalToken;
+    }
     return config;
   },
   (error) => {
@@ -19,6 +24,14 @@ axios.interceptors.request.use(
   }
 );
 
+axios.interceptors.response.use((response) => {
+  const causalToken = response.headers['x-causal-token'];
+  if (causalToken) {
+    localStorage.setItem('causalToken', causalToken);
+  }
+  return response;
+});
+
 // Components
 const LoginRegister = ({ onLogin }) => {
   const [isLogin, setIsLogin] = useState(true);
@@ -185,6 +198,9 @@ const Dashboard = ({ user, onLogout }) => {
   const [showCreateRequest, setShowCreateRequest] = useState(false);
   const [showCreateOffer, setShowCreateOffer] = useState(false);
   const [selectedRequest, setSelectedRequest] = useState(null);
+  const bootstrapped = useRef(false);
+  const syncCursor = useRef(null);
+  const loadedLists = useRef(new Set());
 
   useEffect(() => {
     loadData();
@@ -192,29 +208,86 @@ const Dashboard = ({ user, onLogout }) => {
 
   const loadData = async () => {
     try {
-      // Load categories
-      const categoriesRes = await axios.get(`${API}/categories`);
-      setCategories(categoriesRes.data);
+      if (!bootstrapped.current) {
+        // First paint: categories, stats and the role's lists in one round trip
+        const bootstrapRes = await axios.get(`${API}/dashboard/bootstrap`);
+        const data = bootstrapRes.data;
+        setCategories(data.categories);
+        setStats(data.stats);
+        if (data.requests) setRequests(data.requests);
+        if (data.my_requests) setMyRequests(data.my_requests);
+        if (data.my_offers) setMyOffers(data.my_offers);
+        ['requests', 'my_requests', 'my_offers'].forEach(list => {
+          if (data[list]) loadedLists.current.add(list);
+        });
+        syncCursor.current = data.sync_cursor;
+        bootstrapped.current = true;
+        return;
+      }
 
       // Load stats
       const statsRes = await axios.get(`${API}/dashboard/stats`);
       setStats(statsRes.data);
 
-      if (activeTab === 'browse-requests') {
+      // Apply only what changed since the last load. Lists not loaded yet, or
+      // every list once the sync cursor has expired, are fetched in full.
+      if (!syncCursor.current || !(await syncChanges())) {
+        loadedLists.current.clear();
+      }
+
+      if (activeTab === 'browse-requests' && !loadedLists.current.has('requests')) {
         const requestsRes = await axios.get(`${API}/requests`);
         setRequests(requestsRes.data);
-      } else if (activeTab === 'my-requests') {
+        loadedLists.current.add('requests');
+      } else if (activeTab === 'my-requests' && !loadedLists.current.has('my_requests')) {
         const myRequestsRes = await axios.get(`${API}/requests/my`);
         setMyRequests(myRequestsRes.data);
-      } else if (activeTab === 'my-offers') {
+        loadedLists.current.add('my_requests');
+      } else if (activeTab === 'my-offers' && !loadedLists.current.has('my_offers')) {
         const myOffersRes = await axios.get(`${API}/offers/my`);
         setMyOffers(myOffersRes.data);
+        loadedLists.current.add('my_offers');
       }
     } catch (error) {
       console.error('Error loading data:', error);
     }
   };
 
+  const mergeChanges = (list, changed, removedIds = []) => {
+    const byId = new Map(list.map(item => [item.id, item]));
+    changed.forEach(item => {
+      const current = byId.get(item.id);
+      if (!current || (current.version || 0) <= item.version) {
+        byId.set(item.id, { ...current, ...item });
+      }
+    });
+    removedIds.forEach(id => byId.delete(id));
+    return Array.from(byId.values()).sort((a, b) => new Date(b.created_at) - new Date(a.created_at));
+  };
+
+  // Returns false when the cursor has expired and lists must be reloaded
+  const syncChanges = async () => {
+    let changes;
+    do {
+      const syncRes = await axios.get(`${API}/sync`, { params: { since: syncCursor.current } });
+      changes = syncRes.data;
+      syncCursor.current = changes.cursor;
+      if (changes.reset) {
+        return false;
+      }
+
+      const openRequests = changes.requests.filter(req => req.status === 'open');
+      const closedRequests = changes.requests.filter(req => req.status !== 'open').map(req => req.id);
+      setRequests(list => mergeChanges(list, openRequests, [...changes.closed_requests, ...closedRequests]));
+      if (user.user_type === 'customer') {
+        setMyRequests(list => mergeChanges(list, changes.requests.filter(req => req.customer_id === user.id)));
+      } else {
+        setMyOffers(list => mergeChanges(list, changes.offers.filter(offer => offer.seller_id === user.id)));
+      }
+    } while (changes.has_more);
+    return true;
+  };
+
   const CreateRequestForm = () => {
     const [formData, setFormData] = useState({
       title: '',
@@ -230,12 +303,14 @@ const Dashboard = ({ user, onLogout }) => {
     const handleSubmit = async (e) => {
       e.preventDefault();
       try {
-        await axios.post(`${API}/requests`, {
+        const res = await axios.post(`${API}/requests`, {
           ...formData,
           budget_min: parseFloat(formData.budget_min),
           budget_max: parseFloat(formData.budget_max),
           quantity: parseInt(formData.quantity)
         });
+        // Sync only returns changes once they have settled, so show our own write straight away
+        setMyRequests(list => mergeChanges(list, [res.data]));
         setShowCreateRequest(false);
         loadData();
         alert('Request created successfully!');
@@ -354,11 +429,12 @@ const Dashboard = ({ user, onLogout }) => {
     const handleSubmit = async (e) => {
       e.preventDefault();
       try {
-        await axios.post(`${API}/offers`, {
+        const res = await axios.post(`${API}/offers`, {
           ...formData,
           request_id: selectedRequest.id,
           price: parseFloat(formData.price)
         });
+        setMyOffers(list => mergeChanges(list, [res.data]));
         setShowCreateOffer(false);
         setSelectedRequest(null);
         alert('Offer submitted successfully!');
@@ -509,6 +585,10 @@ const Dashboard = ({ user, onLogout }) => {
   const acceptOffer = async (offerId) => {
     try {
       await axios.put(`${API}/offers/${offerId}/accept`);
+      const accepted = offers.find(offer => offer.id === offerId);
+      if (accepted) {
+        setMyRequests(list => list.map(req => req.id === accepted.request_id ? { ...req, status: 'offer_accepted' } : req));
+      }
       alert('Offer accepted! Payment process will begin.');
       loadData();
     } catch (error) {
@@ -710,7 +790,14 @@ const Dashboard = ({ user, onLogout }) => {
                 offers.map(offer => (
                   <div key={offer.id} className="bg-white rounded-lg shadow-md p-6 mb-4">
                     <div className="flex justify-between items-start mb-4">
-                      <h3 className="text-lg font-semibold">{offer.seller_name}</h3>
+                      <div>
+                        <h3 className="text-lg font-semibold">{offer.seller_name}</h3>
+                        {offer.seller_reputation && offer.seller_reputation.offers_made > 0 && (
+                          <p className="text-sm text-gray-500">
+                            {Math.round(offer.seller_reputation.accepted_ratio * 100)}% of {offer.seller_reputation.offers_made} offers accepted
+                          </p>
+                        )}
+                      </div>
                       <span className={`px-3 py-1 rounded-full text-sm ${
                         offer.status === 'pending' ? 'bg-yellow-100 text-yellow-800' :
                         offer.status === 'accepted' ? 'bg-green-100 text-green-800' :
@@ -769,6 +856,7 @@ function App() {
   const handleLogout = () => {
     localStorage.removeItem('token');
     localStorage.removeItem('user');
+    localStorage.removeItem('causalToken');
     setUser(null);
   };
 
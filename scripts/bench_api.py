@@ -0,0 +1,107 @@
+"""Drive the API in-process against the in-memory storage backend.
+
+Seeds a deterministic dataset (scripts/seed_synthetic_data.py) into
+STORAGE_BACKEND=memory, runs the app's startup hooks, then fires requests
+through an ASGI transport with no network or MongoDB in the way. What is
+left is the CPU cost of routing, validation, filtering and serialization,
+which is what this is for: profile it, or compare branches by req/s.
+
+    python scripts/bench_api.py [--requests 5000] [--calls 2000] [--concurrency 32] [--endpoint /requests ...]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ.setdefault("DB_NAME", "bench_api")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import httpx  # noqa: E402
+
+from backend.server import app, create_access_token, db  # noqa: E402
+from seed_synthetic_data import seed  # noqa: E402
+
+# path -> which seeded user calls it
+ENDPOINTS = {
+    "/requests": "customer",
+    "/requests?category=Electronics&min_budget=100&max_budget=900": "customer",
+    "/requests/my": "customer",
+    "/offers/my": "seller",
+    "/dashboard/stats": "seller",
+    "/dashboard/bootstrap": "customer",
+    "/categories": "customer",
+}
+
+
+async def call_endpoint(http, path, tokens, calls, concurrency, rng):
+    latencies = []
+    errors = 0
+    pending = iter(range(calls))
+    headers = [{"Authorization": f"Bearer {token}"} for token in tokens]
+    choices = [rng.choice(headers) for _ in range(calls)]
+
+    async def worker():
+        nonlocal errors
+        for i in pending:
+            started = time.perf_counter()
+            response = await http.get(f"/api{path}", headers=choices[i])
+            latencies.append((time.perf_counter() - started) * 1000)
+            errors += response.status_code >= 400
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return calls / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1], errors
+
+
+async def run(args):
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("backend.server.access").setLevel(logging.WARNING)
+    started = time.perf_counter()
+    seeded = await seed(db, args.customers, args.sellers, args.requests, seed=args.seed)
+    print(f"seeded {len(seeded['requests'])} requests, {len(seeded['offers'])} offers, "
+          f"{seeded['messages']} messages in {time.perf_counter() - started:.1f}s")
+
+    rng = random.Random(args.seed)
+    tokens = {
+        role: [create_access_token(data={"sub": user.id}) for user in seeded[f"{role}s"][:args.users]]
+        for role in ("customer", "seller")
+    }
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            print(f"{args.calls} calls per endpoint, concurrency {args.concurrency}")
+            print(f"{'endpoint':<64}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+            for path in args.endpoint or ENDPOINTS:
+                role = ENDPOINTS.get(path, "customer")
+                await call_endpoint(http, path, tokens[role], min(args.calls, 50), args.concurrency, rng)  # warm up
+                rate, p50, p95, errors = await call_endpoint(http, path, tokens[role], args.calls,
+                                                             args.concurrency, rng)
+                print(f"{path:<64}{rate:>10.0f}{p50:>10.2f}{p95:>10.2f}{errors:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=500)
+    parser.add_argument("--sellers", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=50, help="distinct callers per role")
+    parser.add_argument("--calls", type=int, default=2000, help="calls per endpoint")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--endpoint", action="append", help="path under /api to benchmark (repeatable)")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Measure what response compression costs and saves, per endpoint.
+
+Seeds the in-memory backend (see scripts/bench_api.py), fetches each
+endpoint's uncompressed JSON body once, then compresses that body with every
+codec setting and reports the compressed size, CPU time per response and
+CPU time per KB saved. The last columns time full calls through the app with
+and without Accept-Encoding, so the middleware's overhead shows up next to
+the bytes it saves.
+
+    python scripts/bench_compression.py [--requests 5000] [--repeat 50] [--calls 300]
+
+Brotli settings are skipped when the brotli package is not installed.
+"""
+import argparse
+import asyncio
+import gzip
+import logging
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ.setdefault("DB_NAME", "bench_compression")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import httpx  # noqa: E402
+
+from backend.server import COMPRESSION_MIN_BYTES, app, brotli, create_access_token, db  # noqa: E402
+from seed_synthetic_data import seed  # noqa: E402
+
+CODECS = {"gzip-1": lambda body: gzip.compress(body, 1),
+          "gzip-6": lambda body: gzip.compress(body, 6),
+          "gzip-9": lambda body: gzip.compress(body, 9)}
+if brotli is not None:
+    CODECS.update({f"br-{quality}": (lambda body, quality=quality: brotli.compress(body, quality=quality))
+                   for quality in (1, 4, 11)})
+
+
+def codec_cost(body, codec, repeat):
+    started = time.process_time()
+    for _ in range(repeat):
+        compressed = codec(body)
+    return len(compressed), (time.process_time() - started) / repeat
+
+
+async def median_call_ms(http, path, headers, calls):
+    latencies = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        response = await http.get(f"/api{path}", headers=headers)
+        latencies.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+    return statistics.median(latencies)
+
+
+async def run(args):
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("backend.server.access").setLevel(logging.WARNING)
+    seeded = await seed(db, args.customers, args.sellers, args.requests,
+                        messages_per_offer=args.messages_per_offer, seed=args.seed)
+    message = await db.messages.find_one({})
+    customer = seeded["customers"][0]
+    seller = max(seeded["sellers"], key=lambda s: sum(offer.seller_id == s.id for offer in seeded["offers"]))
+    token = {user.id: create_access_token(data={"sub": user.id}) for user in (customer, seller)}
+    token[message["sender_id"]] = create_access_token(data={"sub": message["sender_id"]})
+
+    # (label, path, caller)
+    endpoints = [
+        ("/requests", "/requests", customer.id),
+        ("/offers/my", "/offers/my", seller.id),
+        ("/messages/conversation/{id}",
+         f"/messages/conversation/{message['request_id']}?other_user_id={message['receiver_id']}",
+         message["sender_id"]),
+        ("/dashboard/bootstrap", "/dashboard/bootstrap", customer.id),
+        ("/categories", "/categories", customer.id),
+    ]
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            print(f"compression threshold {COMPRESSION_MIN_BYTES} bytes, {args.repeat} runs per codec")
+            print(f"{'endpoint':<34}{'codec':<8}{'raw KB':>9}{'out KB':>9}{'ratio':>8}"
+                  f"{'cpu ms':>9}{'us/KB saved':>13}")
+            for label, path, user_id in endpoints:
+                headers = {"Authorization": f"Bearer {token[user_id]}"}
+                body = (await http.get(f"/api{path}", headers={**headers, "Accept-Encoding": "identity"})).content
+                for name, codec in CODECS.items():
+                    size, cpu = codec_cost(body, codec, args.repeat)
+                    saved_kb = (len(body) - size) / 1024
+                    per_kb = f"{cpu * 1e6 / saved_kb:.1f}" if saved_kb > 0 else "-"
+                    print(f"{label:<34}{name:<8}{len(body) / 1024:>9.1f}{size / 1024:>9.1f}"
+                          f"{size / len(body):>8.1%}{cpu * 1000:>9.3f}{per_kb:>13}")
+
+            print(f"\nthrough the app, median of {args.calls} calls")
+            print(f"{'endpoint':<34}{'identity ms':>13}{'negotiated ms':>15}{'encoding':>10}{'wire KB':>9}")
+            for label, path, user_id in endpoints:
+                headers = {"Authorization": f"Bearer {token[user_id]}"}
+                negotiated = {**headers, "Accept-Encoding": "br, gzip"}
+                identity_ms = await median_call_ms(http, path, {**headers, "Accept-Encoding": "identity"}, args.calls)
+                negotiated_ms = await median_call_ms(http, path, negotiated, args.calls)
+                async with http.stream("GET", f"/api{path}", headers=negotiated) as response:
+                    wire = sum([len(chunk) async for chunk in response.aiter_raw()])
+                    encoding = response.headers.get("content-encoding", "-")
+                print(f"{label:<34}{identity_ms:>13.2f}{negotiated_ms:>15.2f}"
+                      f"{encoding:>10}{wire / 1024:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=500)
+    parser.add_argument("--sellers", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--messages-per-offer", type=int, default=25, help="average messages per offer")
+    parser.add_argument("--repeat", type=int, default=50, help="compressions per codec and endpoint")
+    parser.add_argument("--calls", type=int, default=300, help="calls per endpoint through the app")
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Compare the per-message and bucketed message layouts on a live MongoDB.
+
+Seeds the same synthetic conversations into both layouts inside a scratch
+database, then reports data/index size and get_conversation read latency.
+
+    python scripts/bench_message_storage.py [--conversations 2000] [--messages 150]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.server import (  # noqa: E402
+    append_message_to_bucket,
+    client,
+    conversation_key,
+    read_bucketed_conversation,
+)
+
+WORDS = "price delivery size colour available tomorrow pickup deposit photo quality please thanks".split()
+
+
+def make_conversations(count, messages_per_conversation, rng):
+    conversations = []
+    start = datetime.utcnow() - timedelta(days=30)
+    for _ in range(count):
+        request_id, customer, seller = (str(uuid.uuid4()) for _ in range(3))
+        messages = []
+        for i in range(messages_per_conversation):
+            sender, receiver = (customer, seller) if rng.random() < 0.5 else (seller, customer)
+            messages.append({
+                "id": str(uuid.uuid4()),
+                "request_id": request_id,
+                "offer_id": None,
+                "sender_id": sender,
+                "receiver_id": receiver,
+                "content": " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 20))),
+                "created_at": start + timedelta(minutes=i),
+            })
+        conversations.append((request_id, customer, seller, messages))
+    return conversations
+
+
+async def seed(bench_db, conversations):
+    await bench_db.messages.create_index([("request_id", 1), ("sender_id", 1), ("receiver_id", 1), ("created_at", 1)])
+    await bench_db.message_buckets.create_index([("conversation_key", 1), ("last_at", -1)])
+    await bench_db.message_buckets.create_index("request_id")
+    for _, _, _, messages in conversations:
+        await bench_db.messages.insert_many([dict(msg) for msg in messages])
+        for msg in messages:
+            await append_message_to_bucket(bench_db.message_buckets, dict(msg))
+
+
+async def collection_size(bench_db, name):
+    stats = await bench_db.command("collStats", name)
+    return stats["count"], stats["size"], stats["totalIndexSize"]
+
+
+async def time_reads(read, samples):
+    latencies = []
+    for args in samples:
+        started = time.perf_counter()
+        await read(*args)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    bench_db = client[args.db]
+    await client.drop_database(args.db)
+    conversations = make_conversations(args.conversations, args.messages, rng)
+    await seed(bench_db, conversations)
+
+    samples = [rng.choice(conversations)[:3] for _ in range(args.reads)]
+
+    async def read_documents(request_id, customer, seller):
+        return await bench_db.messages.find({
+            "request_id": request_id,
+            "$or": [
+                {"sender_id": customer, "receiver_id": seller},
+                {"sender_id": seller, "receiver_id": customer}
+            ]
+        }).sort("created_at", 1).to_list(100)
+
+    async def read_buckets(request_id, customer, seller):
+        return await read_bucketed_conversation(bench_db.message_buckets, conversation_key(request_id, customer, seller))
+
+    print(f"{args.conversations} conversations x {args.messages} messages, {args.reads} reads")
+    print(f"{'layout':<10}{'docs':>10}{'data MB':>10}{'index MB':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for layout, collection, read in (
+        ("documents", "messages", read_documents),
+        ("buckets", "message_buckets", read_buckets),
+    ):
+        count, size, index_size = await collection_size(bench_db, collection)
+        p50, p95 = await time_reads(read, samples)
+        print(f"{layout:<10}{count:>10}{size / 2**20:>10.1f}{index_size / 2**20:>10.1f}{p50:>10.2f}{p95:>10.2f}")
+
+    if not args.keep:
+        await client.drop_database(args.db)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="bench_message_storage", help="scratch database, dropped before and after")
+    parser.add_argument("--conversations", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=150, help="messages per conversation")
+    parser.add_argument("--reads", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
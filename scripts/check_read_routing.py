@@ -0,0 +1,100 @@
+"""Exercise read routing against a local replica set.
+
+Start a three-member replica set, for example:
+
+    for port in 27017 27018 27019; do
+        mkdir -p /tmp/rs/$port
+        mongod --replSet rs0 --port $port --dbpath /tmp/rs/$port --fork --logpath /tmp/rs/$port.log
+    done
+    mongosh --port 27017 --eval 'rs.initiate({_id: "rs0", members: [
+        {_id: 0, host: "localhost:27017"}, {_id: 1, host: "localhost:27018"}, {_id: 2, host: "localhost:27019"}]})'
+
+then run (the script uses and drops its own scratch database)
+
+    MONGO_URL="mongodb://localhost:27017,localhost:27018,localhost:27019/?replicaSet=rs0" \\
+        python scripts/check_read_routing.py [--rounds 200]
+
+Each round, a customer creates a request and reads it back straight away
+(GET /requests/{id} and GET /requests/my), which must never miss even when
+the read is served by a lagging secondary. Listings are then read with the
+open-requests snapshot disabled so they reach MongoDB. The script prints how
+reads were split across members and fails if any read-your-writes check did.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import uuid
+from pathlib import Path
+
+os.environ["DB_NAME"] = "check_read_routing"  # scratch database, dropped before and after
+os.environ.setdefault("ADMIN_TOKEN", uuid.uuid4().hex)
+os.environ["OPEN_REQUESTS_SNAPSHOT_ENABLED"] = "false"
+os.environ["DUPLICATE_DETECTION_ENABLED"] = "false"
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx  # noqa: E402
+
+from backend.server import ADMIN_TOKEN, CATEGORIES, app, client  # noqa: E402
+
+
+async def register(http, user_type):
+    response = await http.post("/api/register", json={
+        "email": f"{user_type}-{uuid.uuid4().hex[:8]}@routing.example",
+        "password": "password123",
+        "full_name": f"Routing {user_type}",
+        "user_type": user_type,
+    })
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run(args):
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("backend.server.access").setLevel(logging.WARNING)
+    await client.drop_database(os.environ["DB_NAME"])
+    misses = 0
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://check") as http:
+            customer = await register(http, "customer")
+            seller = await register(http, "seller")
+            for i in range(args.rounds):
+                created = await http.post("/api/requests", headers=customer, json={
+                    "title": f"Routing check {i}",
+                    "description": f"Read-your-writes probe number {i}",
+                    "budget_min": 10,
+                    "budget_max": 100,
+                    "categories": [CATEGORIES[i % len(CATEGORIES)]],
+                })
+                created.raise_for_status()
+                request_id = created.json()["id"]
+                fetched = await http.get(f"/api/requests/{request_id}", headers=customer)
+                mine = await http.get("/api/requests/my", headers=customer)
+                if fetched.status_code != 200 or request_id not in {req["id"] for req in mine.json()}:
+                    misses += 1
+                await http.get("/api/requests", headers=seller)
+
+            routing = (await http.get("/api/admin/read-routing", headers={"X-Admin-Token": ADMIN_TOKEN})).json()
+
+    print(f"{args.rounds} rounds, read preference {routing['read_preference']}")
+    print(f"{'member':<28}{'role':<12}{'reads':>8}{'share':>8}")
+    for member, stats in routing["members"].items():
+        print(f"{member:<28}{stats['role']:<12}{stats['reads']:>8.0f}{stats['share']:>8.1%}")
+    print(f"read-your-writes misses: {misses}")
+    if not args.keep:
+        await client.drop_database(os.environ["DB_NAME"])
+    return misses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database")
+    sys.exit(1 if asyncio.run(run(parser.parse_args())) else 0)
+
+
+if __name__ == "__main__":
+    main()
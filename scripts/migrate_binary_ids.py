@@ -0,0 +1,120 @@
+"""Convert string ids to 16-byte BSON UUIDs in place, online.
+
+1. Restart the backend with ID_STORAGE_FORMAT=dual: new documents are written
+   with binary ids and every id lookup matches both forms.
+2. Run this script. It rewrites documents that still hold string ids in
+   batches and prints collection and index sizes before and after.
+3. Restart the backend with ID_STORAGE_FORMAT=binary.
+
+    python scripts/migrate_binary_ids.py [--batch-size 1000] [--report-only]
+
+Only ids that parse as UUIDs are converted.
+"""
+import argparse
+import asyncio
+import sys
+import uuid
+from pathlib import Path
+
+from pymongo import UpdateOne
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.server import ID_FIELDS, db  # noqa: E402
+
+COLLECTIONS = ("users", "requests", "offers", "messages", "message_buckets")
+
+
+def binary_ids(doc):
+    changes = {}
+    for field in ID_FIELDS:
+        value = doc.get(field)
+        if isinstance(value, str):
+            try:
+                changes[field] = uuid.UUID(value)
+            except ValueError:
+                pass
+    return changes
+
+
+def bucket_changes(bucket):
+    changes = binary_ids(bucket)
+    messages = bucket.get("messages", [])
+    if any(binary_ids(msg) for msg in messages):
+        changes["messages"] = [{**msg, **binary_ids(msg)} for msg in messages]
+    return changes
+
+
+async def collection_sizes():
+    sizes = {}
+    existing = await db.list_collection_names()
+    for name in COLLECTIONS:
+        stats = await db.command("collStats", name) if name in existing else {}
+        sizes[name] = (stats.get("count", 0), stats.get("size", 0), stats.get("totalIndexSize", 0))
+    return sizes
+
+
+async def migrate_collection(name, batch_size):
+    collection = db[name]
+    string_ids = [{field: {"$type": "string"}} for field in ID_FIELDS]
+    if name == "message_buckets":
+        string_ids += [{f"messages.{field}": {"$type": "string"}} for field in ID_FIELDS]
+    changes_for = bucket_changes if name == "message_buckets" else binary_ids
+
+    converted = 0
+    last_id = None
+    while True:
+        query = {"$or": string_ids}
+        if last_id is not None:
+            query = {"$and": [query, {"_id": {"$gt": last_id}}]}
+        batch = await collection.find(query).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+        operations = [UpdateOne({"_id": doc["_id"]}, {"$set": changes})
+                      for doc in batch if (changes := changes_for(doc))]
+        if operations:
+            result = await collection.bulk_write(operations, ordered=False)
+            converted += result.modified_count
+    return converted
+
+
+def print_sizes(before, after):
+    print(f"{'collection':<18}{'docs':>10}{'data MB':>18}{'index MB':>18}")
+    for name in COLLECTIONS:
+        count, size_before, index_before = before[name]
+        _, size_after, index_after = after[name]
+        print(f"{name:<18}{count:>10}"
+              f"{size_before / 2**20:>8.1f} -> {size_after / 2**20:<6.1f}"
+              f"{index_before / 2**20:>8.1f} -> {index_after / 2**20:<6.1f}")
+    data = sum(v[1] for v in before.values()), sum(v[1] for v in after.values())
+    index = sum(v[2] for v in before.values()), sum(v[2] for v in after.values())
+    print(f"working set (data + indexes): {(data[0] + index[0]) / 2**20:.1f} MB -> "
+          f"{(data[1] + index[1]) / 2**20:.1f} MB")
+
+
+async def run(args):
+    before = await collection_sizes()
+    if not args.report_only:
+        for name in COLLECTIONS:
+            converted = await migrate_collection(name, args.batch_size)
+            print(f"{name}: converted {converted} documents")
+        if args.compact:
+            # Rewritten documents leave free space behind until compacted
+            for name in COLLECTIONS:
+                await db.command("compact", name)
+    after = await collection_sizes()
+    print_sizes(before, after)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--report-only", action="store_true", help="print sizes without converting")
+    parser.add_argument("--compact", action="store_true",
+                        help="run compact on each collection after converting so sizes reflect the new layout")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Copy per-message documents from `messages` into `message_buckets`.
+
+Run this while the backend still uses MESSAGE_STORAGE_MODE=documents, run it
+once more right before switching to MESSAGE_STORAGE_MODE=buckets, and do not
+run it after the switch: every pass rebuilds the buckets of each migrated
+request from `messages`, replacing whatever buckets that request already had.
+
+    python scripts/migrate_messages_to_buckets.py [--request-id ID ...] [--dry-run]
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.server import MESSAGE_BUCKET_SIZE, conversation_key, db  # noqa: E402
+
+
+def build_buckets(messages):
+    # `messages` belong to one request and are sorted by created_at
+    open_buckets = {}
+    buckets = []
+    for msg in messages:
+        msg.pop("_id", None)
+        key = conversation_key(msg["request_id"], msg["sender_id"], msg["receiver_id"])
+        bucket = open_buckets.get(key)
+        if bucket is None or bucket["count"] >= MESSAGE_BUCKET_SIZE:
+            bucket = {
+                "conversation_key": key,
+                "request_id": msg["request_id"],
+                "messages": [],
+                "count": 0,
+                "first_at": msg["created_at"],
+            }
+            open_buckets[key] = bucket
+            buckets.append(bucket)
+        bucket["messages"].append(msg)
+        bucket["count"] += 1
+        bucket["last_at"] = msg["created_at"]
+    return buckets
+
+
+async def migrate(request_ids, dry_run):
+    if not request_ids:
+        request_ids = await db.messages.distinct("request_id")
+
+    total_messages = 0
+    total_buckets = 0
+    for request_id in request_ids:
+        messages = await db.messages.find({"request_id": request_id}).sort("created_at", 1).to_list(None)
+        buckets = build_buckets(messages)
+        total_messages += len(messages)
+        total_buckets += len(buckets)
+        if dry_run or not buckets:
+            continue
+        await db.message_buckets.delete_many({"request_id": request_id})
+        await db.message_buckets.insert_many(buckets)
+
+    print(f"{len(request_ids)} requests, {total_messages} messages -> {total_buckets} buckets"
+          f"{' (dry run)' if dry_run else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--request-id", action="append", default=[], help="migrate only this request (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="count buckets without writing them")
+    args = parser.parse_args()
+    asyncio.run(migrate(args.request_id, args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""Rebuild the seller_reputation collection from offers and requests.
+
+Reputation is maintained incrementally as offers are made and accepted. Run
+this once after deploying to backfill sellers with existing offers, and
+off-peak whenever the counters are suspected to have drifted.
+
+    python scripts/recompute_seller_reputation.py
+"""
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.server import recompute_seller_reputation  # noqa: E402
+
+
+async def run():
+    sellers = await recompute_seller_reputation()
+    print(f"recomputed reputation of {sellers} sellers")
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter).parse_args()
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
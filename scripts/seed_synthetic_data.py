@@ -0,0 +1,191 @@
+"""Load a deterministic synthetic marketplace into MongoDB.
+
+The same --seed always produces the same users, requests, offers and
+messages (ids, text, prices and relative timestamps), so profiles and
+benchmarks taken on different machines or branches see the same data.
+Timestamps are spread over the --days before now so the lifecycle sweeper
+and trial expiry behave as they would on live data.
+
+    python scripts/seed_synthetic_data.py [--customers 500] [--sellers 200] [--requests 5000] [--drop]
+
+Every seeded user can log in with the password `password123`. `seed()` is
+importable and also works against the STORAGE_BACKEND=memory store (see
+scripts/bench_api.py).
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.server import (  # noqa: E402
+    CATEGORIES,
+    MESSAGE_STORAGE_MODE,
+    Message,
+    Offer,
+    Request,
+    User,
+    append_message_to_bucket,
+    client,
+    hash_password,
+    to_db_doc,
+)
+
+PASSWORD = "password123"
+LOCATIONS = ["Lagos", "Abuja", "Port Harcourt", "Ibadan", "Kano", "Enugu", "Benin City", None]
+ITEMS = "laptop sofa bicycle generator fridge phone camera wardrobe printer speaker jacket tyres".split()
+ADJECTIVES = "used new refurbished cheap sturdy portable large small vintage modern".split()
+WORDS = "price delivery size colour available tomorrow pickup deposit photo quality please thanks".split()
+STATUSES = ["open"] * 7 + ["offer_accepted", "completed", "cancelled"]
+
+
+def make_id(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def sentence(rng, words, low, high):
+    return " ".join(rng.choice(words) for _ in range(rng.randint(low, high)))
+
+
+def make_users(rng, count, user_type, now, days):
+    users = []
+    for i in range(count):
+        created_at = now - timedelta(days=rng.uniform(0, days))
+        users.append(User(
+            id=make_id(rng),
+            email=f"{user_type}{i}@seed.example",
+            full_name=f"Seed {user_type.title()} {i}",
+            user_type=user_type,
+            location=rng.choice(LOCATIONS),
+            business_name=f"Seed Shop {i}" if user_type == "seller" else None,
+            subscription_status=rng.choice(["trial", "active", "active"]),
+            trial_expires_at=created_at + timedelta(days=30),
+            created_at=created_at,
+        ))
+    return users
+
+
+def make_requests(rng, customers, count, now, days):
+    requests = []
+    for _ in range(count):
+        item = rng.choice(ITEMS)
+        budget_min = rng.randrange(10, 2000, 5)
+        requests.append(Request(
+            id=make_id(rng),
+            customer_id=rng.choice(customers).id,
+            title=f"{rng.choice(ADJECTIVES).title()} {item} wanted",
+            description=f"Looking for a {rng.choice(ADJECTIVES)} {item}. {sentence(rng, WORDS, 5, 30)}",
+            budget_min=budget_min,
+            budget_max=budget_min + rng.randrange(0, 1000, 5),
+            categories=rng.sample(CATEGORIES, rng.randint(1, 2)),
+            location=rng.choice(LOCATIONS),
+            quantity=rng.randint(1, 3),
+            status=rng.choice(STATUSES),
+            created_at=now - timedelta(days=rng.uniform(0, days)),
+        ))
+    return requests
+
+
+def make_offers(rng, requests, sellers, offers_per_request, now):
+    offers = []
+    for request in requests:
+        for seller in rng.sample(sellers, min(len(sellers), rng.randint(0, offers_per_request * 2))):
+            offers.append(Offer(
+                id=make_id(rng),
+                request_id=request.id,
+                seller_id=seller.id,
+                price=round(rng.uniform(request.budget_min * 0.8, request.budget_max * 1.2), 2),
+                description=sentence(rng, WORDS, 5, 20),
+                delivery_details=f"Delivery in {rng.randint(1, 14)} days",
+                created_at=min(now, request.created_at + timedelta(hours=rng.uniform(0, 72))),
+            ))
+    return offers
+
+
+def make_messages(rng, requests_by_id, offers, messages_per_offer, now):
+    messages = []
+    for offer in offers:
+        customer_id = requests_by_id[offer.request_id].customer_id
+        for i in range(rng.randint(0, messages_per_offer * 2)):
+            sender, receiver = (customer_id, offer.seller_id) if rng.random() < 0.5 else (offer.seller_id, customer_id)
+            messages.append(Message(
+                id=make_id(rng),
+                request_id=offer.request_id,
+                offer_id=offer.id,
+                sender_id=sender,
+                receiver_id=receiver,
+                content=sentence(rng, WORDS, 3, 20),
+                created_at=min(now, offer.created_at + timedelta(minutes=10 * i)),
+            ))
+    return messages
+
+
+async def insert_batched(collection, docs, batch_size):
+    for start in range(0, len(docs), batch_size):
+        await collection.insert_many(docs[start:start + batch_size])
+
+
+async def seed(database, customers=500, sellers=200, requests=5000, offers_per_request=3,
+               messages_per_offer=4, days=60, seed=42, batch_size=1000):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    password = hash_password(PASSWORD)
+
+    customer_users = make_users(rng, customers, "customer", now, days)
+    seller_users = make_users(rng, sellers, "seller", now, days)
+    request_models = make_requests(rng, customer_users, requests, now, days)
+    offer_models = make_offers(rng, request_models, seller_users, offers_per_request, now)
+    message_models = make_messages(rng, {r.id: r for r in request_models}, offer_models, messages_per_offer, now)
+    message_models.sort(key=lambda msg: msg.created_at)
+
+    await insert_batched(database.users, [to_db_doc({**user.dict(), "password": password})
+                                          for user in customer_users + seller_users], batch_size)
+    await insert_batched(database.requests, [to_db_doc(r.dict()) for r in request_models], batch_size)
+    await insert_batched(database.offers, [to_db_doc(o.dict()) for o in offer_models], batch_size)
+    if MESSAGE_STORAGE_MODE == "buckets":
+        for msg in message_models:
+            await append_message_to_bucket(database.message_buckets, to_db_doc(msg.dict()))
+    else:
+        await insert_batched(database.messages, [to_db_doc(m.dict()) for m in message_models], batch_size)
+
+    return {
+        "customers": customer_users,
+        "sellers": seller_users,
+        "requests": request_models,
+        "offers": offer_models,
+        "messages": len(message_models),
+    }
+
+
+async def run(args):
+    if args.drop:
+        await client.drop_database(args.db)
+    seeded = await seed(client[args.db], args.customers, args.sellers, args.requests, args.offers_per_request,
+                        args.messages_per_offer, args.days, args.seed, args.batch_size)
+    print(f"seeded {args.db}: {len(seeded['customers'])} customers, {len(seeded['sellers'])} sellers, "
+          f"{len(seeded['requests'])} requests, {len(seeded['offers'])} offers, {seeded['messages']} messages "
+          f"({MESSAGE_STORAGE_MODE})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=os.environ.get("DB_NAME"), help="target database (default: DB_NAME)")
+    parser.add_argument("--customers", type=int, default=500)
+    parser.add_argument("--sellers", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--offers-per-request", type=int, default=3, help="average offers per request")
+    parser.add_argument("--messages-per-offer", type=int, default=4, help="average messages per offer")
+    parser.add_argument("--days", type=int, default=60, help="spread created_at over this many past days")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--drop", action="store_true", help="drop the database first")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import os
+import sys
+import uuid
+from pathlib import Path
+
+# Configure the app before anything imports it: in-memory storage, no
+# background work beyond what a test starts itself
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["DB_NAME"] = "tests"
+os.environ.setdefault("ADMIN_TOKEN", "test-admin-token")
+os.environ.setdefault("LIFECYCLE_SWEEP_ENABLED", "false")
+os.environ.setdefault("SYNC_SETTLE_MS", "0")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from backend import server  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def api():
+    with TestClient(server.app) as client:
+        yield client
+
+
+@pytest.fixture
+def register(api):
+    def register(user_type, **extra):
+        response = api.post("/api/register", json={
+            "email": f"{user_type}-{uuid.uuid4().hex[:8]}@tests.example",
+            "password": "password123",
+            "full_name": f"Test {user_type}",
+            "user_type": user_type,
+            **extra,
+        })
+        assert response.status_code == 200, response.text
+        body = response.json()
+        return {"Authorization": f"Bearer {body['access_token']}"}, body["user"]
+    return register
+
+
+@pytest.fixture
+def create_request(api):
+    def create_request(headers, **fields):
+        response = api.post("/api/requests", headers=headers, json={
+            "title": f"Wanted {uuid.uuid4().hex}",
+            "description": f"Looking for {uuid.uuid4().hex} in good condition",
+            "budget_min": 10,
+            "budget_max": 100,
+            "categories": ["Electronics"],
+            **fields,
+        })
+        assert response.status_code == 200, response.text
+        return response.json()
+    return create_request
@@ -0,0 +1,18 @@
+import numpy as np
+
+from backend.server import ANALYTICS_QUANTILES, grouped_quantiles
+
+
+def test_grouped_quantiles_match_numpy_per_group():
+    rng = np.random.default_rng(3)
+    codes = rng.integers(0, 5, 500)
+    values = rng.normal(100, 30, 500)
+    codes[codes == 3] = 4  # group 3 is empty
+
+    result = grouped_quantiles(codes, values, 6)
+    for group in range(6):
+        members = values[codes == group]
+        if len(members):
+            np.testing.assert_allclose(result[group], np.quantile(members, ANALYTICS_QUANTILES))
+        else:
+            assert np.isnan(result[group]).all()
@@ -0,0 +1,94 @@
+import asyncio
+import time
+
+from bson import Int64, Timestamp
+
+from backend import server
+
+CLUSTER_TIME = {"clusterTime": Timestamp(1700000000, 5), "signature": {"hash": b"\x01" * 20, "keyId": Int64(7)}}
+
+
+def test_token_round_trip_keeps_cluster_time():
+    token = server.encode_causal_token("user-1", (CLUSTER_TIME, Timestamp(1700000000, 5)), 1234.5)
+    assert server.decode_causal_token(token, "user-1") == ((CLUSTER_TIME, Timestamp(1700000000, 5)), 1234.5)
+
+
+def test_foreign_malformed_or_expired_tokens_are_ignored(monkeypatch):
+    token = server.encode_causal_token("user-1", None, 1234.5)
+    assert server.decode_causal_token(token, "user-2") is None
+    assert server.decode_causal_token("not-a-token", "user-1") is None
+    assert server.decode_causal_token(token[:-2] + "xx", "user-1") is None
+    assert server.decode_causal_token(server.create_access_token({"sub": "user-1"}), "user-1") is None
+    monkeypatch.setattr(server, "CAUSAL_TOKEN_SECONDS", -1)
+    assert server.decode_causal_token(server.encode_causal_token("user-1", None, 1234.5), "user-1") is None
+
+
+def test_causal_token_is_not_a_credential(api, register):
+    customer, user = register("customer")
+    response = api.post("/api/requests", headers=customer, json={
+        "title": "Wanted", "description": "Anything at all", "budget_min": 1, "budget_max": 2, "categories": ["Electronics"],
+    })
+    token = response.headers["x-causal-token"]
+    assert api.get("/api/profile", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+    # Nor is an old-style token without an expiry
+    unbounded = server.jwt.encode({"sub": user["id"]}, server.JWT_SECRET, algorithm=server.JWT_ALGORITHM)
+    assert api.get("/api/profile", headers={"Authorization": f"Bearer {unbounded}"}).status_code == 401
+    assert api.get("/api/profile", headers=customer).status_code == 200
+
+
+class RecordingSession:
+    cluster_time = None
+    operation_time = None
+
+    def advance_cluster_time(self, cluster_time):
+        self.cluster_time = cluster_time
+
+    def advance_operation_time(self, operation_time):
+        self.operation_time = operation_time
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+def test_session_starts_after_the_later_of_local_and_token_times(monkeypatch):
+    session = RecordingSession()
+
+    async def start_session(**options):
+        return session
+
+    monkeypatch.setattr(server.client, "start_session", start_session)
+    monkeypatch.setattr(server, "causal_write_times", server.LRUCache(10))
+    server.causal_write_times.set("user-1", ({"clusterTime": Timestamp(1700000000, 1)}, Timestamp(1700000000, 1)))
+    token = server.encode_causal_token("user-1", (CLUSTER_TIME, Timestamp(1700000000, 5)), time.time())
+
+    async def read():
+        context_token = server.log_context.set({"causal_token_received": token})
+        try:
+            async with server.user_session("user-1"):
+                return session.cluster_time, session.operation_time
+        finally:
+            server.log_context.reset(context_token)
+
+    assert asyncio.run(read()) == (CLUSTER_TIME, Timestamp(1700000000, 5))
+
+
+def test_reads_on_another_worker_follow_the_token(api, register, create_request, monkeypatch):
+    customer, user = register("customer")
+    response = api.post("/api/requests", headers=customer, json={
+        "title": "Wanted", "description": "Anything at all", "budget_min": 1, "budget_max": 2, "categories": ["Electronics"],
+    })
+    token = response.headers["x-causal-token"]
+    assert server.decode_causal_token(token, user["id"])[1] <= time.time()
+
+    # A worker that did not see the write only knows about it from the token
+    monkeypatch.setattr(server, "user_write_times", server.LRUCache(10))
+    monkeypatch.setattr(server, "causal_write_times", server.LRUCache(10))
+    assert not server.wrote_recently(user["id"])
+    context_token = server.log_context.set({"causal_token_received": token})
+    try:
+        assert server.wrote_recently(user["id"])
+    finally:
+        server.log_context.reset(context_token)
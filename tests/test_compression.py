@@ -0,0 +1,47 @@
+import gzip
+
+import pytest
+
+from backend import server
+from backend.server import negotiate_encoding
+
+
+@pytest.mark.parametrize("header,expected", [
+    ("gzip", "gzip"),
+    ("gzip, deflate", "gzip"),
+    ("deflate", None),
+    ("gzip;q=0, identity", None),
+    ("*", "gzip"),
+    ("*, gzip;q=0", None),
+    ("", None),
+])
+def test_negotiate_encoding_without_brotli(monkeypatch, header, expected):
+    monkeypatch.setattr(server, "brotli", None)
+    assert negotiate_encoding(header) == expected
+
+
+@pytest.mark.parametrize("header,expected", [
+    ("gzip, br", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("br;q=0, gzip;q=0.1", "gzip"),
+])
+def test_negotiate_encoding_prefers_brotli_on_ties(monkeypatch, header, expected):
+    monkeypatch.setattr(server, "brotli", object())
+    assert negotiate_encoding(header) == expected
+
+
+def test_large_json_is_gzipped_and_small_is_not(api, register, create_request):
+    headers, _ = register("customer")
+    for _ in range(20):
+        create_request(headers)
+    response = api.get("/api/requests", headers={**headers, "Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+
+    raw = api.get("/api/requests", headers={**headers, "Accept-Encoding": "identity"})
+    assert "content-encoding" not in raw.headers
+    assert raw.json() == response.json()
+    assert len(gzip.compress(raw.content)) < len(raw.content)
+
+    small = api.get("/api/categories", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
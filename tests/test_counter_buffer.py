@@ -0,0 +1,57 @@
+import asyncio
+
+from backend import server
+from backend.server import CounterBuffer
+
+
+def test_flush_writes_summed_increments():
+    async def run():
+        buffer = CounterBuffer("test_counts", max_keys=10, max_unflushed=1000)
+        for _ in range(3):
+            buffer.add("a", "views")
+        buffer.add("a", "impressions", 5)
+        buffer.add("b", "views")
+        await buffer.flush()
+        await buffer.flush()  # nothing pending: no second write
+        return await server.db.test_counts.find({}).sort("_id", 1).to_list(None)
+
+    docs = asyncio.run(run())
+    assert [(doc["_id"], doc.get("views"), doc.get("impressions")) for doc in docs] == [("a", 3, 5), ("b", 1, None)]
+
+
+def test_new_keys_beyond_the_bound_are_dropped():
+    buffer = CounterBuffer("test_bounded", max_keys=2, max_unflushed=1000)
+    dropped = server.metrics["counters.test_bounded.dropped"]
+    for key in ("a", "b", "c"):
+        buffer.add(key, "views")
+    buffer.add("a", "views")  # existing keys still count
+    assert server.metrics["counters.test_bounded.dropped"] == dropped + 1
+    assert set(buffer._pending) == {"a", "b"}
+
+
+def test_reaching_the_loss_tolerance_flushes_early():
+    async def run():
+        buffer = CounterBuffer("test_early", max_keys=10, max_unflushed=3)
+        for _ in range(3):
+            buffer.add("a", "views")
+        await buffer._early_flush
+        return await server.db.test_early.find_one({"_id": "a"}), buffer._pending
+
+    doc, pending = asyncio.run(run())
+    assert doc["views"] == 3 and pending == {}
+
+
+def test_failed_flush_keeps_increments(monkeypatch):
+    class FailingCollection:
+        async def bulk_write(self, operations, ordered=True):
+            raise RuntimeError("unavailable")
+
+    monkeypatch.setattr(server, "db", {"test_failing": FailingCollection()})
+
+    async def run():
+        buffer = CounterBuffer("test_failing", max_keys=10, max_unflushed=1000)
+        buffer.add("a", "views", 2)
+        await buffer.flush()
+        return dict(buffer._pending["a"])
+
+    assert asyncio.run(run()) == {"views": 2}
@@ -0,0 +1,34 @@
+import asyncio
+import uuid
+
+from backend import server
+
+
+def test_offer_flow_across_id_formats(api, register, create_request, monkeypatch):
+    # A request stored with string ids, then offers made after switching to
+    # the migration mode, which writes binary ids
+    customer, _ = register("customer")
+    seller, seller_user = register("seller", business_name="Dual Shop")
+    request = create_request(customer)
+
+    monkeypatch.setattr(server, "ID_STORAGE_FORMAT", "dual")
+    offer = api.post("/api/offers", headers=seller, json={
+        "request_id": request["id"], "price": 50, "description": "Can deliver", "delivery_details": "Tomorrow",
+    })
+    assert offer.status_code == 200, offer.text
+    stored = asyncio.run(server.db.offers.find_one({"id": uuid.UUID(offer.json()["id"])}))
+    assert isinstance(stored["request_id"], uuid.UUID)
+
+    offers = api.get(f"/api/offers/request/{request['id']}", headers=customer).json()
+    assert [o["id"] for o in offers] == [offer.json()["id"]]
+    assert offers[0]["seller_name"] == "Dual Shop"
+    assert api.get("/api/dashboard/stats", headers=customer).json()["total_offers_received"] == 1
+    assert [o["id"] for o in api.get("/api/offers/my", headers=seller).json()] == [offer.json()["id"]]
+
+    accepted = api.put(f"/api/offers/{offer.json()['id']}/accept", headers=customer)
+    assert accepted.status_code == 200, accepted.text
+    assert api.get(f"/api/requests/{request['id']}", headers=customer).json()["status"] == "offer_accepted"
+
+    asyncio.run(server.recompute_seller_reputation())
+    reputation = asyncio.run(server.load_seller_reputations([seller_user["id"]]))[seller_user["id"]]
+    assert reputation.offers_accepted == 1 and reputation.median_price_to_budget == 0.5
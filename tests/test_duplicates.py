@@ -0,0 +1,19 @@
+from backend.server import MinHashLSH
+
+
+def test_similar_texts_match_and_unrelated_do_not():
+    lsh = MinHashLSH(num_perm=64, bands=16, shingle_size=5)
+    lsh.add("bike", lsh.signature("Need a red bicycle for a five year old child"))
+    lsh.add("sofa", lsh.signature("Looking for a three seater leather sofa"))
+
+    matches = lsh.query(lsh.signature("Need a red bicycle for a five-year-old child!"), 0.7)
+    assert [key for key, _ in matches] == ["bike"]
+    assert lsh.query(lsh.signature("Selling vintage camera lenses in bulk"), 0.7) == []
+
+
+def test_removed_keys_are_not_returned():
+    lsh = MinHashLSH(num_perm=64, bands=16, shingle_size=5)
+    signature = lsh.signature("Need a red bicycle for a five year old child")
+    lsh.add("bike", signature)
+    lsh.remove("bike")
+    assert lsh.query(signature, 0.1) == [] and len(lsh) == 0
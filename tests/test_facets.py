@@ -0,0 +1,31 @@
+import asyncio
+import os
+import subprocess
+import sys
+import uuid
+from pathlib import Path
+
+from backend import server
+
+
+def test_budgets_below_first_boundary_get_their_own_bucket(api, register, create_request):
+    customer, _ = register("customer")
+    location = f"Town {uuid.uuid4().hex}"
+    create_request(customer, budget_min=10, budget_max=500, location=location)
+    create_request(customer, budget_min=10, budget_max=200000, location=location)
+    create_request(customer, budget_min=-20, budget_max=-10, location=location)
+
+    facets = asyncio.run(server.count_request_facets(location=location))
+    assert facets["total"] == 3
+    counts = [(bucket["min"], bucket["max"], bucket["count"]) for bucket in facets["budget"] if bucket["count"]]
+    assert counts == [(None, 0, 1), (0, 1000, 1), (100000, None, 1)]
+
+
+def test_unsorted_boundaries_fail_startup():
+    root = Path(__file__).resolve().parent.parent
+    env = {**os.environ, "STORAGE_BACKEND": "memory", "FACET_BUDGET_BOUNDARIES": "0,5000,1000"}
+    result = subprocess.run(
+        [sys.executable, "-c", "import backend.server"], cwd=root, env=env, capture_output=True, text=True
+    )
+    assert result.returncode != 0
+    assert "FACET_BUDGET_BOUNDARIES must be sorted and unique" in result.stderr
@@ -0,0 +1,47 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+from backend import server
+
+BODY = {"title": "Wanted", "description": "Anything at all", "budget_min": 1, "budget_max": 2, "categories": ["Electronics"]}
+
+
+def post_request(api, headers, key):
+    return api.post("/api/requests", headers={**headers, "Idempotency-Key": key}, json=BODY)
+
+
+def abandon(user_id, key, pending_until):
+    # What a worker that died between reserving the key and storing the
+    # response leaves behind
+    record = {"_id": f"{user_id}:requests:{key}", "status": "pending", "fingerprint": "x",
+              "lease": "dead-worker", "created_at": datetime.utcnow() - timedelta(minutes=5)}
+    if pending_until is not None:
+        record["pending_until"] = pending_until
+    asyncio.run(server.db.idempotency_keys.insert_one(record))
+
+
+def test_repeat_replays_the_first_response(api, register):
+    customer, _ = register("customer")
+    key = uuid.uuid4().hex
+    first = post_request(api, customer, key)
+    again = post_request(api, customer, key)
+    assert first.status_code == again.status_code == 200
+    assert again.json()["id"] == first.json()["id"]
+
+
+def test_retry_waits_while_the_first_attempt_holds_the_lease(api, register):
+    customer, user = register("customer")
+    key = uuid.uuid4().hex
+    abandon(user["id"], key, datetime.utcnow() + timedelta(minutes=1))
+    assert post_request(api, customer, key).status_code == 409
+
+
+def test_retry_takes_over_an_expired_lease(api, register):
+    customer, user = register("customer")
+    for key, pending_until in [(uuid.uuid4().hex, datetime.utcnow() - timedelta(seconds=1)), (uuid.uuid4().hex, None)]:
+        abandon(user["id"], key, pending_until)
+        taken = post_request(api, customer, key)
+        assert taken.status_code == 200, taken.text
+        server.idempotency_cache.clear()
+        assert post_request(api, customer, key).json()["id"] == taken.json()["id"]
@@ -0,0 +1,48 @@
+import asyncio
+
+from backend import server
+from backend.server import InvalidationBus, OpenRequestsSnapshot
+
+
+def test_failing_tail_backs_off(monkeypatch):
+    bus = InvalidationBus()
+    applied = []
+    bus.subscribe("requests", applied.append, local=False)
+    delays = []
+
+    async def tail():
+        raise RuntimeError("tail down")
+
+    async def sleep(seconds):
+        delays.append(seconds)
+        if len(delays) == 9:
+            raise asyncio.CancelledError
+
+    monkeypatch.setattr(bus, "_tail", tail)
+    monkeypatch.setattr(server, "CACHE_BUS_RETRY_MAX_SECONDS", 60)
+    monkeypatch.setattr(server.asyncio, "sleep", sleep)
+    try:
+        asyncio.run(bus.run())
+    except asyncio.CancelledError:
+        pass
+    assert delays == [1, 2, 4, 8, 16, 32, 60, 60, 60]
+    assert applied == [None] * 9
+
+
+def test_full_resyncs_coalesce_while_one_is_waiting(monkeypatch):
+    monkeypatch.setattr(server, "open_requests", OpenRequestsSnapshot())
+    monkeypatch.setattr(server, "open_requests_resync_lock", asyncio.Lock())
+    monkeypatch.setattr(server, "open_requests_resync_requested", False)
+
+    async def scenario():
+        for _ in range(5):
+            server.schedule_remote_request_changes(None)
+        assert len(server.open_requests_refresh_tasks) == 1
+        await asyncio.gather(*server.open_requests_refresh_tasks)
+        # Once it has loaded, the next invalidation schedules another
+        server.schedule_remote_request_changes(None)
+        assert len(server.open_requests_refresh_tasks) == 1
+        await asyncio.gather(*server.open_requests_refresh_tasks)
+
+    asyncio.run(scenario())
+    assert server.open_requests.ready
@@ -0,0 +1,23 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from backend import server
+
+
+def test_swept_requests_leave_the_listing_and_duplicate_index(api, register, create_request):
+    customer, _ = register("customer")
+    seller, _ = register("seller")
+    request = create_request(customer)
+    assert request["id"] in server.request_duplicate_groups
+
+    async def age_and_sweep():
+        old = datetime.utcnow() - timedelta(days=server.REQUEST_RETENTION_DAYS + 1)
+        await server.db.requests.update_one({"id": request["id"]}, {"$set": {"created_at": old}})
+        await server.db.leases.delete_many({})
+        await server.run_lifecycle_sweep()
+
+    asyncio.run(age_and_sweep())
+    listed = api.get("/api/requests", headers=seller).json()
+    assert request["id"] not in [req["id"] for req in listed]
+    assert request["id"] not in server.request_duplicate_groups
+    assert api.get(f"/api/requests/{request['id']}", headers=customer).json()["status"] == "expired"
@@ -0,0 +1,41 @@
+import asyncio
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from backend.memory_store import InMemoryClient, apply_update, match_filter
+
+
+def test_match_filter_operators():
+    doc = {"status": "open", "budget_max": 50, "categories": ["Books", "Toys"], "location": "Lagos Island"}
+    assert match_filter(doc, {"status": "open", "budget_max": {"$gte": 50}})
+    assert match_filter(doc, {"categories": {"$in": ["Toys"]}})
+    assert match_filter(doc, {"location": {"$regex": "lagos", "$options": "i"}})
+    assert not match_filter(doc, {"location": {"$regex": "lagos"}})
+    assert match_filter(doc, {"$or": [{"status": "closed"}, {"budget_max": {"$lt": 60}}]})
+    assert not match_filter(doc, {"missing": {"$exists": True}})
+
+
+def test_apply_update_operators():
+    doc = {"views": 1, "samples": [1, 2, 3]}
+    apply_update(doc, {"$inc": {"views": 2}, "$push": {"samples": {"$each": [4, 5], "$slice": -3}},
+                       "$set": {"status": "open"}})
+    assert doc == {"views": 3, "samples": [3, 4, 5], "status": "open"}
+
+
+def test_bulk_upserts_and_facet_pipeline():
+    async def run():
+        collection = InMemoryClient()["tests"]["stats"]
+        await collection.bulk_write([UpdateOne({"_id": key}, {"$inc": {"views": 1}}, upsert=True)
+                                     for key in ["a", "b", "a"]])
+        await collection.insert_one({"_id": "c", "views": 10, "at": datetime(2024, 1, 1)})
+        cursor = collection.aggregate([{"$facet": {
+            "total": [{"$count": "n"}],
+            "bands": [{"$bucket": {"groupBy": "$views", "boundaries": [0, 5], "default": "high"}}],
+        }}])
+        return await collection.find_one({"_id": "a"}), (await cursor.to_list(None))[0]
+
+    doc, facets = asyncio.run(run())
+    assert doc["views"] == 2
+    assert facets["total"] == [{"n": 3}]
+    assert facets["bands"] == [{"_id": 0, "count": 2}, {"_id": "high", "count": 1}]
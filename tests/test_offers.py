@@ -0,0 +1,64 @@
+import asyncio
+
+from backend import server
+
+
+def make_offer(api, seller, request, price=50):
+    response = api.post("/api/offers", headers=seller, json={
+        "request_id": request["id"], "price": price, "description": "Can deliver", "delivery_details": "Tomorrow",
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def offers_accepted(seller_id):
+    doc = asyncio.run(server.db.seller_reputation.find_one({"_id": seller_id}))
+    return doc.get("offers_accepted", 0) if doc else 0
+
+
+def test_repeated_accept_conflicts_and_counts_once(api, register, create_request):
+    customer, _ = register("customer")
+    seller, seller_user = register("seller", business_name="Repeat Shop")
+    request = create_request(customer)
+    offer = make_offer(api, seller, request)
+
+    assert api.put(f"/api/offers/{offer['id']}/accept", headers=customer).status_code == 200
+    assert api.put(f"/api/offers/{offer['id']}/accept", headers=customer).status_code == 409
+    assert offers_accepted(seller_user["id"]) == 1
+
+
+def test_accepting_second_offer_on_closed_request_conflicts(api, register, create_request):
+    customer, _ = register("customer")
+    first_seller, first_user = register("seller", business_name="First Shop")
+    second_seller, second_user = register("seller", business_name="Second Shop")
+    request = create_request(customer)
+    first = make_offer(api, first_seller, request)
+    second = make_offer(api, second_seller, request, price=60)
+
+    assert api.put(f"/api/offers/{first['id']}/accept", headers=customer).status_code == 200
+    assert api.put(f"/api/offers/{second['id']}/accept", headers=customer).status_code == 409
+    assert offers_accepted(second_user["id"]) == 0
+    statuses = {o["id"]: o["status"] for o in api.get(f"/api/offers/request/{request['id']}", headers=customer).json()}
+    assert statuses == {first["id"]: "accepted", second["id"]: "declined"}
+
+
+def test_offer_closed_after_read_hands_request_back(api, register, create_request, monkeypatch):
+    # The offer expires between the handler reading it and claiming it
+    customer, _ = register("customer")
+    seller, seller_user = register("seller", business_name="Late Shop")
+    request = create_request(customer)
+    offer = make_offer(api, seller, request)
+
+    find_one = server.db.offers.find_one
+
+    async def find_then_expire(*args, **kwargs):
+        doc = await find_one(*args, **kwargs)
+        await server.db.offers.update_one({"id": doc["id"]}, {"$set": {"status": "expired"}})
+        return doc
+
+    monkeypatch.setattr(server.db.offers, "find_one", find_then_expire)
+    assert api.put(f"/api/offers/{offer['id']}/accept", headers=customer).status_code == 409
+    monkeypatch.undo()
+
+    assert api.get(f"/api/requests/{request['id']}", headers=customer).json()["status"] == "open"
+    assert offers_accepted(seller_user["id"]) == 0
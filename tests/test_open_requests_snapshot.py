@@ -0,0 +1,136 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend import server
+from backend.memory_store import match_filter
+from backend.server import CATEGORIES, OpenRequestsSnapshot, Request, build_request_filter
+
+LOCATIONS = ["Lagos", "Abuja", "Port Harcourt", None]
+
+
+def make_requests(count, seed=7):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    requests = []
+    for i in range(count):
+        budget_min = rng.randrange(0, 1000, 10)
+        requests.append(Request(
+            customer_id="customer",
+            title=f"Request {i}",
+            description="description",
+            budget_min=budget_min,
+            budget_max=budget_min + rng.randrange(0, 500, 10),
+            categories=rng.sample(CATEGORIES, rng.randint(1, 2)),
+            location=rng.choice(LOCATIONS),
+            created_at=start + timedelta(minutes=i),
+        ))
+    return requests
+
+
+@pytest.fixture(scope="module")
+def loaded():
+    requests = make_requests(600)
+    snapshot = OpenRequestsSnapshot()
+    snapshot.begin_load()
+    snapshot.finish_load(requests)
+    return snapshot, requests
+
+
+@pytest.mark.parametrize("category,min_budget,max_budget,location", [
+    (None, None, None, None),
+    ("Electronics", None, None, None),
+    (None, 400, None, None),
+    (None, None, 300, None),
+    (None, 200, 600, None),
+    ("Books & Media", 100, 900, "lag"),
+    (None, None, None, "ABUJA"),
+    (None, None, None, "port harc"),
+    (None, 5000, None, None),
+    # narrow budget ranges, scanned through the budget indexes
+    (None, 1300, None, None),
+    (None, None, 20, None),
+    ("Electronics", 1200, None, "a"),
+    (None, 1250, 1260, None),
+])
+def test_query_matches_mongo_filter(loaded, category, min_budget, max_budget, location):
+    snapshot, requests = loaded
+    filter_dict = build_request_filter(category, min_budget, max_budget, location)
+    expected = [req.id for req in sorted(requests, key=lambda req: req.created_at, reverse=True)
+                if match_filter(req.dict(), filter_dict)][:100]
+    assert [req.id for req in snapshot.query(category, min_budget, max_budget, location)] == expected
+
+
+def test_budget_range_scan_respects_limit(loaded):
+    snapshot, requests = loaded
+    expected = [req.id for req in sorted(requests, key=lambda req: req.created_at, reverse=True)
+                if req.budget_max >= 1200][:3]
+    assert [req.id for req in snapshot.query(min_budget=1200, limit=3)] == expected
+
+
+def test_upsert_and_remove_keep_indexes_consistent(loaded):
+    snapshot = OpenRequestsSnapshot()
+    snapshot.begin_load()
+    snapshot.finish_load(make_requests(20))
+    newest = snapshot.query(limit=1)[0]
+    snapshot.upsert(newest.model_copy(update={"status": "offer_accepted"}))
+    assert newest.id not in {req.id for req in snapshot.query()}
+    assert len(snapshot) == 19
+    snapshot.remove(snapshot.query(limit=1)[0].id)
+    assert len(snapshot.query()) == 18
+
+
+@pytest.mark.parametrize("location", ["(", "^abuja$", "(a+)+$", "lag|abu"])
+def test_location_patterns_defer_to_mongo(loaded, location):
+    snapshot, _ = loaded
+    assert snapshot.query(location=location) is None
+
+
+def test_backtracking_location_pattern_does_not_run_on_the_snapshot():
+    snapshot = OpenRequestsSnapshot()
+    snapshot.begin_load()
+    snapshot.finish_load([request.model_copy(update={"location": "a" * 30 + "!"}) for request in make_requests(3)])
+    started = time.perf_counter()
+    assert snapshot.query(location="(a+)+$") is None
+    assert time.perf_counter() - started < 0.1
+
+
+def test_changes_during_load_are_replayed():
+    snapshot = OpenRequestsSnapshot()
+    requests = make_requests(5)
+    snapshot.begin_load()
+    snapshot.remove(requests[0].id)
+    snapshot.finish_load(requests)
+    assert requests[0].id not in {req.id for req in snapshot.query()}
+
+
+def test_concurrent_resyncs_keep_writes_made_during_the_load(monkeypatch):
+    monkeypatch.setattr(server, "open_requests", OpenRequestsSnapshot())
+    monkeypatch.setattr(server, "open_requests_resync_lock", asyncio.Lock())
+    written = Request(customer_id="customer", title="Written during load", description="description",
+                      budget_min=10, budget_max=20, categories=["Electronics"])
+
+    async def scenario():
+        loads = [asyncio.create_task(server.resync_open_requests()) for _ in range(2)]
+        await asyncio.sleep(0)
+        # Both reloads have started; a write lands before either finishes
+        await server.db.requests.insert_one(written.dict())
+        server.open_requests.upsert(written)
+        await asyncio.gather(*loads)
+
+    asyncio.run(scenario())
+    assert written.id in [request.id for request in server.open_requests.query()]
+
+
+def test_remote_changes_are_held_until_applied():
+    async def scenario():
+        server.schedule_remote_request_changes(["missing"])
+        assert len(server.open_requests_refresh_tasks) == 1
+        await asyncio.gather(*server.open_requests_refresh_tasks)
+        await asyncio.sleep(0)
+        assert not server.open_requests_refresh_tasks
+
+    asyncio.run(scenario())
@@ -0,0 +1,18 @@
+from types import SimpleNamespace
+
+from backend import server
+
+
+def succeeded(command_name, host):
+    return SimpleNamespace(command_name=command_name, connection_id=(host, 27017), request_id=1,
+                           duration_micros=100, reply={})
+
+
+def test_reads_are_counted_once_per_query(monkeypatch):
+    monkeypatch.setattr(server, "metrics", server.defaultdict(float))
+    listener = server.MongoCommandListener()
+    for command_name in ["find", "getMore", "getMore", "aggregate", "insert"]:
+        listener.succeeded(succeeded(command_name, "primary.example"))
+    listener.succeeded(succeeded("find", "secondary.example"))
+    assert server.metrics["reads.primary.example:27017"] == 2
+    assert server.metrics["reads.secondary.example:27017"] == 1
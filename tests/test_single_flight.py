@@ -0,0 +1,60 @@
+import asyncio
+
+from backend.server import SingleFlight
+
+
+def test_concurrent_calls_share_one_load():
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def run():
+        flight = SingleFlight("test")
+        return await asyncio.gather(*(flight.do(("key",), load) for _ in range(5)))
+
+    assert asyncio.run(run()) == [1] * 5
+    assert calls == 1
+
+
+def test_ttl_reuses_results_until_invalidated():
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    async def run():
+        flight = SingleFlight("test_ttl", ttl=60)
+        first = await flight.do(("key",), load)
+        cached = await flight.do(("key",), load)
+        flight.invalidate([("key",)])
+        return first, cached, await flight.do(("key",), load)
+
+    assert asyncio.run(run()) == (1, 1, 2)
+
+
+def test_load_in_flight_during_invalidation_is_not_cached():
+    async def run():
+        flight = SingleFlight("test_stale", ttl=60)
+        release = asyncio.Event()
+
+        async def slow_load():
+            await release.wait()
+            return "stale"
+
+        async def fresh_load():
+            return "fresh"
+
+        pending = asyncio.create_task(flight.do(("key",), slow_load))
+        await asyncio.sleep(0)
+        flight.invalidate()
+        release.set()
+        assert await pending == "stale"
+        return await flight.do(("key",), fresh_load)
+
+    assert asyncio.run(run()) == "fresh"
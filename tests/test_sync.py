@@ -0,0 +1,31 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from backend.server import decode_sync_cursor, encode_sync_cursor
+
+
+def test_cursor_round_trip_keeps_millisecond_precision():
+    at, change_id = datetime(2024, 5, 1, 12, 30, 15, 123000), ObjectId()
+    assert decode_sync_cursor(encode_sync_cursor(at, change_id)) == (at, change_id)
+
+
+@pytest.mark.parametrize("cursor", ["", "abc", "12.notanobjectid", "1.2.3"])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_sync_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_sync_returns_changes_after_the_bootstrap_cursor(api, register, create_request):
+    customer, _ = register("customer")
+    seller, _ = register("seller")
+    cursor = api.get("/api/dashboard/bootstrap", headers=seller).json()["sync_cursor"]
+    created = create_request(customer)
+
+    changes = api.get("/api/sync", params={"since": cursor}, headers=seller).json()
+    assert created["id"] in [req["id"] for req in changes["requests"]]
+    again = api.get("/api/sync", params={"since": changes["cursor"]}, headers=seller).json()
+    assert created["id"] not in [req["id"] for req in again["requests"]]